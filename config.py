@@ -19,6 +19,28 @@ CHARGE_TARGET_SOC = 0.80
 CANDIDATE_ORDERS_K = 20
 CANDIDATE_STATIONS_K = 5
 
+# Sparse global assignment: starting radius (km) when widening for unmatched bikes
+SPARSE_FALLBACK_RADIUS_KM = 1.0
+# global_sparse only goes sparse from this many idle-bike x open-order cells;
+# below it the dense solve is faster (crossover measured at ~5k-20k cells)
+SPARSE_MIN_CELLS = 10000
+
+# Rolling-horizon batched global dispatch: solve every BATCH_WINDOW_MIN minutes
+# (or earlier once BATCH_SIZE_K new idle bikes / new orders have accumulated)
+BATCH_WINDOW_MIN = 3
+BATCH_SIZE_K = 20
+
+# Spatial index (uniform grid) cell size for nearest-order / nearest-station queries
+SPATIAL_CELL_KM = 0.25
+
+# Optional road-network travel (simulator.road_network): synthetic grid street
+# spacing, share of non-essential links removed, how many order-to-order
+# shortest-path rows and how many snapped points stay cached
+ROAD_GRID_SPACING_KM = 0.25
+ROAD_DROP_FRAC = 0.15
+ROAD_LRU_ROWS = 256
+ROAD_SNAP_CACHE = 65536
+
 @dataclass
 class Weights:
     w_travel: float = 1.0
@@ -1,7 +1,11 @@
 # data/generate_data.py
 from __future__ import annotations
+import math
 import random
-from typing import List
+from typing import List, Optional, Tuple
+
+import numpy as np
+
 from config import CITY_SIZE_KM, RANDOM_SEED
 from model.bike import Bike
 from model.order import Order
@@ -10,31 +14,42 @@ from model.station import Station
 import csv
 import os
 
-def save_generated_data(bikes, orders, stations, folder="data/saved"):
-    os.makedirs(folder, exist_ok=True)
+# bump whenever a generator changes what it draws for given parameters/seed
+# (invalidates data.scenario_cache entries)
+GENERATOR_VERSION = 1
 
-    with open(os.path.join(folder, "bikes.csv"), "w", newline="") as f:
+def _write_csv_atomic(path: str, header: List[str], rows) -> None:
+    # write next to the target and rename, so a reader (or a concurrent
+    # writer) never sees a half-written file
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", newline="") as f:
         w = csv.writer(f)
-        w.writerow(["id","x","y","soc","battery_wh","wh_per_km","speed_kmph"])
-        for b in bikes:
-            w.writerow([b.id,b.x,b.y,b.soc,b.battery_wh,b.wh_per_km,b.speed_kmph])
+        w.writerow(header)
+        w.writerows(rows)
+    os.replace(tmp, path)
 
-    with open(os.path.join(folder, "orders.csv"), "w", newline="") as f:
-        w = csv.writer(f)
-        w.writerow(["id","x","y","release_time","deadline","service_time"])
-        for o in orders:
-            w.writerow([o.id,o.x,o.y,o.release_time,o.deadline,o.service_time])
 
-    with open(os.path.join(folder, "stations.csv"), "w", newline="") as f:
-        w = csv.writer(f)
-        w.writerow(["id","x","y","ports","charge_rate_w"])
-        for s in stations:
-            w.writerow([s.id,s.x,s.y,s.ports,s.charge_rate_w])
+def save_generated_data(bikes, orders, stations, folder="data/saved"):
+    os.makedirs(folder, exist_ok=True)
+
+    _write_csv_atomic(os.path.join(folder, "bikes.csv"),
+                      ["id","x","y","soc","battery_wh","wh_per_km","speed_kmph"],
+                      ([b.id,b.x,b.y,b.soc,b.battery_wh,b.wh_per_km,b.speed_kmph] for b in bikes))
+    _write_csv_atomic(os.path.join(folder, "orders.csv"),
+                      ["id","x","y","release_time","deadline","service_time"],
+                      ([o.id,o.x,o.y,o.release_time,o.deadline,o.service_time] for o in orders))
+    _write_csv_atomic(os.path.join(folder, "stations.csv"),
+                      ["id","x","y","ports","charge_rate_w"],
+                      ([s.id,s.x,s.y,s.ports,s.charge_rate_w] for s in stations))
 
 
 def set_seed(seed: int = RANDOM_SEED) -> None:
     random.seed(seed)
 
+def make_rng(seed: int = RANDOM_SEED) -> random.Random:
+    # private stream for one run; make_rng(s) draws the same numbers as set_seed(s)
+    return random.Random(seed)
+
 def generate_bikes(n: int) -> List[Bike]:
     bikes: List[Bike] = []
 
@@ -74,7 +89,9 @@ def generate_orders(n: int, horizon_min: int = 120) -> List[Order]:
         )
     return orders
 '''
-def generate_orders(n: int, horizon_min: int = 120) -> List[Order]:
+def generate_orders(n: int, horizon_min: int = 120, rng: Optional[random.Random] = None) -> List[Order]:
+    # rng: independent stream (see make_rng); defaults to the global random module
+    rng = rng or random
     orders: List[Order] = []
 
     depot_x = CITY_SIZE_KM / 2.0
@@ -82,23 +99,23 @@ def generate_orders(n: int, horizon_min: int = 120) -> List[Order]:
     proxy_speed_kmph = 18.0  # matches bike speed in generate_bikes
 
     for i in range(n):
-        x = random.uniform(0, CITY_SIZE_KM)
-        y = random.uniform(0, CITY_SIZE_KM)
+        x = rng.uniform(0, CITY_SIZE_KM)
+        y = rng.uniform(0, CITY_SIZE_KM)
 
-        release = random.randint(0, horizon_min)
+        release = rng.randint(0, horizon_min)
 
         # distance-aware travel-time proxy from depot
         d = ((x - depot_x) ** 2 + (y - depot_y) ** 2) ** 0.5
         t_proxy = max(1, int((d / proxy_speed_kmph) * 60.0 + 0.9999))  # ceil without math
 
         # Slack tiers create meaningful urgency variety
-        r = random.random()
+        r = rng.random()
         if r < 0.35:
-            slack = random.randint(5, 12)     # tight
+            slack = rng.randint(5, 12)     # tight
         elif r < 0.80:
-            slack = random.randint(13, 25)    # medium
+            slack = rng.randint(13, 25)    # medium
         else:
-            slack = random.randint(26, 45)    # loose
+            slack = rng.randint(26, 45)    # loose
 
         deadline = release + t_proxy + slack
 
@@ -115,8 +132,42 @@ def generate_orders(n: int, horizon_min: int = 120) -> List[Order]:
     return orders
 
 
-def generate_stations(n: int) -> List[Station]:
-    # place stations spread out
+def generate_orders_np(n: int, horizon_min: int = 120, seed: int = RANDOM_SEED) -> List[Order]:
+    """
+    Vectorized generate_orders: same distributions (uniform location,
+    release in [0, horizon_min], depot travel-time proxy plus a tight /
+    medium / loose slack tier) drawn in bulk from a NumPy Generator.
+    Not the same random numbers as the random-module version.
+    """
+    rng = np.random.default_rng(seed)
+    depot = CITY_SIZE_KM / 2.0
+    proxy_speed_kmph = 18.0  # matches bike speed in generate_bikes
+
+    x = rng.uniform(0, CITY_SIZE_KM, n)
+    y = rng.uniform(0, CITY_SIZE_KM, n)
+    release = rng.integers(0, horizon_min, n, endpoint=True)
+
+    d = np.hypot(x - depot, y - depot)
+    t_proxy = np.maximum(1, ((d / proxy_speed_kmph) * 60.0 + 0.9999).astype(np.int64))
+
+    r = rng.random(n)
+    slack = np.where(r < 0.35, rng.integers(5, 12, n, endpoint=True),       # tight
+                     np.where(r < 0.80, rng.integers(13, 25, n, endpoint=True),  # medium
+                              rng.integers(26, 45, n, endpoint=True)))           # loose
+    deadline = release + t_proxy + slack
+
+    return [
+        Order(id=i, x=xi, y=yi, release_time=rt, deadline=dl, service_time=2)
+        for i, (xi, yi, rt, dl) in enumerate(zip(x.tolist(), y.tolist(), release.tolist(), deadline.tolist()))
+    ]
+
+
+def station_points(n: int) -> List[Tuple[float, float]]:
+    """
+    Station coordinates for any count. Up to five stations use the original
+    hand-picked points; beyond that they are spread over ceil(sqrt(n)) rows
+    with an even share of stations per row, each row evenly spaced.
+    """
     base_points = [
         (1.0, 4.0),
         (4.0, 1.0),
@@ -124,9 +175,22 @@ def generate_stations(n: int) -> List[Station]:
         (0.5, 0.5),
         (4.5, 4.5),
     ]
+    if n <= len(base_points):
+        return base_points[:n]
+
+    rows = math.ceil(math.sqrt(n))
+    points: List[Tuple[float, float]] = []
+    for r in range(rows):
+        count = n // rows + (1 if r < n % rows else 0)
+        y = (r + 0.5) * CITY_SIZE_KM / rows
+        points.extend(((c + 0.5) * CITY_SIZE_KM / count, y) for c in range(count))
+    return points
+
+
+def generate_stations(n: int) -> List[Station]:
+    # place stations spread out
     stations: List[Station] = []
-    for i in range(n):
-        x, y = base_points[i % len(base_points)]
+    for i, (x, y) in enumerate(station_points(n)):
         stations.append(
             Station(
                 id=i,
@@ -137,3 +201,17 @@ def generate_stations(n: int) -> List[Station]:
             )
         )
     return stations
+
+
+def generate_scenario(sc: dict, seed: int = RANDOM_SEED) -> Tuple[List[Bike], List[Order], List[Station]]:
+    """
+    Bikes, orders and stations for one scenario dict (see data.scenarios),
+    drawn from the seed's own stream: make_rng(seed) for the default
+    generator, generate_orders_np for generator="numpy".
+    """
+    horizon = sc.get("horizon_min", 120)
+    if sc.get("generator", "python") == "numpy":
+        orders = generate_orders_np(sc["orders"], horizon, seed)
+    else:
+        orders = generate_orders(sc["orders"], horizon, rng=make_rng(seed))
+    return generate_bikes(sc["bikes"]), orders, generate_stations(sc["stations"])
@@ -0,0 +1,160 @@
+# data/saved_data.py
+from __future__ import annotations
+import itertools
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from config import Weights
+from data.scenario_cache import BIKE_COLUMNS, ORDER_COLUMNS, STATION_COLUMNS
+from model.bike import Bike
+from model.order import Order
+from model.station import Station
+from simulator.environment import Environment
+from simulator.trace import TraceRecorder
+
+SAVED_DIR = os.path.join("data", "saved")
+
+# rows parsed per block when streaming orders
+ORDER_CHUNK_ROWS = 65536
+
+# columns a file may leave out, with the model defaults
+_OPTIONAL = {"service_time": 2}
+
+
+def _header(line: str) -> List[str]:
+    return [c.strip() for c in line.strip().split(",")]
+
+
+def _column_indices(header: List[str], columns: Dict[str, type], path: str) -> Tuple[List[int], List[str]]:
+    missing = [k for k in columns if k not in header and k not in _OPTIONAL]
+    if missing:
+        raise ValueError(f"{path}: missing column(s) {', '.join(missing)}")
+    present = [k for k in columns if k in header]
+    return [header.index(k) for k in present], present
+
+
+def _parse(lines: Iterable[str], usecols: List[int], names: List[str],
+           columns: Dict[str, type]) -> Dict[str, np.ndarray]:
+    # one bulk parse for all columns; float64 holds every int id/minute exactly
+    block = np.loadtxt(lines, delimiter=",", usecols=usecols, dtype=np.float64, ndmin=2)
+    out = {k: block[:, j].astype(columns[k]) for j, k in enumerate(names)}
+    for k, default in _OPTIONAL.items():
+        if k in columns and k not in out:
+            out[k] = np.full(len(block), default, dtype=columns[k])
+    return out
+
+
+def read_columns(path: str, columns: Dict[str, type]) -> Dict[str, np.ndarray]:
+    """The named columns of a CSV written by save_generated_data (any column order)."""
+    with open(path, "r", encoding="utf-8") as f:
+        usecols, names = _column_indices(_header(f.readline()), columns, path)
+        return _parse(f, usecols, names, columns)
+
+
+def _build(cls, arrays: Dict[str, np.ndarray], columns: Dict[str, type]) -> list:
+    # columns are in constructor order; tolist() hands the models Python scalars
+    return [cls(*row) for row in zip(*(arrays[k].tolist() for k in columns))]
+
+
+def load_bikes(folder: str = SAVED_DIR) -> List[Bike]:
+    return _build(Bike, read_columns(os.path.join(folder, "bikes.csv"), BIKE_COLUMNS), BIKE_COLUMNS)
+
+
+def load_orders(folder: str = SAVED_DIR) -> List[Order]:
+    return _build(Order, read_columns(os.path.join(folder, "orders.csv"), ORDER_COLUMNS), ORDER_COLUMNS)
+
+
+def load_stations(folder: str = SAVED_DIR) -> List[Station]:
+    return _build(Station, read_columns(os.path.join(folder, "stations.csv"), STATION_COLUMNS),
+                  STATION_COLUMNS)
+
+
+def load_dataset(folder: str = SAVED_DIR) -> Tuple[List[Bike], List[Order], List[Station]]:
+    """Bikes, orders and stations from a save_generated_data folder."""
+    return load_bikes(folder), load_orders(folder), load_stations(folder)
+
+
+class OrderStream:
+    """
+    Orders read lazily from an orders.csv sorted by release_time.
+
+    The file is parsed ORDER_CHUNK_ROWS rows at a time and take_until(t)
+    hands out the orders released by minute t, so only the part of the
+    file the clock has reached is ever turned into Order objects. A row
+    released earlier than the one before it raises ValueError (sort the
+    file, or load it eagerly with load_orders).
+    """
+
+    def __init__(self, path: str, chunk_rows: int = ORDER_CHUNK_ROWS):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self._f = open(path, "r", encoding="utf-8")
+        self._usecols, self._names = _column_indices(_header(self._f.readline()), ORDER_COLUMNS, path)
+        self._buf: Dict[str, np.ndarray] = {}
+        self._pos = 0
+        self._len = 0
+        self._last_release: Optional[int] = None
+        self._fill()
+
+    def _fill(self) -> None:
+        # next block into the buffer; closes the file at the end
+        if self._f is None:
+            return
+        lines = list(itertools.islice(self._f, self.chunk_rows))
+        lines = [ln for ln in lines if ln.strip()]
+        if not lines:
+            self.close()
+            self._buf, self._pos, self._len = {}, 0, 0
+            return
+        buf = _parse(lines, self._usecols, self._names, ORDER_COLUMNS)
+        rt = buf["release_time"]
+        first = int(rt[0])
+        if (self._last_release is not None and first < self._last_release) or (np.diff(rt) < 0).any():
+            raise ValueError(f"{self.path}: orders are not sorted by release_time")
+        self._last_release = int(rt[-1])
+        self._buf, self._pos, self._len = buf, 0, len(rt)
+
+    def peek_time(self) -> Optional[int]:
+        """Release time of the next order not yet taken, or None at the end of the file."""
+        if self._pos >= self._len:
+            self._fill()
+            if self._pos >= self._len:
+                return None
+        return int(self._buf["release_time"][self._pos])
+
+    def take_until(self, t: int) -> List[Order]:
+        """Every not yet taken order with release_time <= t, in file order."""
+        out: List[Order] = []
+        while True:
+            nxt = self.peek_time()
+            if nxt is None or nxt > t:
+                return out
+            rt = self._buf["release_time"]
+            end = int(np.searchsorted(rt, t, side="right"))
+            part = {k: v[self._pos:end] for k, v in self._buf.items()}
+            out.extend(_build(Order, part, ORDER_COLUMNS))
+            self._pos = end
+
+    def close(self) -> None:
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+
+def build_environment(folder: str = SAVED_DIR, weights: Optional[Weights] = None,
+                      stream_orders: bool = False, chunk_rows: int = ORDER_CHUNK_ROWS,
+                      **env_kwargs) -> Environment:
+    """
+    Environment over a saved dataset. With stream_orders=True the orders
+    come from an OrderStream (orders.csv must be sorted by release_time)
+    and the trace is off unless one is passed explicitly.
+    """
+    weights = weights or Weights()
+    bikes, stations = load_bikes(folder), load_stations(folder)
+    if not stream_orders:
+        return Environment(bikes, load_orders(folder), stations, weights, **env_kwargs)
+    env_kwargs.setdefault("trace", TraceRecorder(enabled=False))
+    stream = OrderStream(os.path.join(folder, "orders.csv"), chunk_rows)
+    return Environment(bikes, [], stations, weights, order_stream=stream, **env_kwargs)
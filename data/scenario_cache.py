@@ -0,0 +1,90 @@
+# data/scenario_cache.py
+from __future__ import annotations
+import hashlib
+import json
+import os
+import tempfile
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from config import RANDOM_SEED
+from data.generate_data import GENERATOR_VERSION, generate_scenario
+from model.bike import Bike
+from model.order import Order
+from model.station import Station
+
+CACHE_DIR = os.path.join("data", "cache")
+
+# columns stored per entity, in constructor order (float64 keeps values bit-exact)
+BIKE_COLUMNS = {"id": np.int64, "x": np.float64, "y": np.float64, "soc": np.float64,
+                "battery_wh": np.float64, "wh_per_km": np.float64, "speed_kmph": np.float64}
+ORDER_COLUMNS = {"id": np.int64, "x": np.float64, "y": np.float64, "release_time": np.int64,
+                 "deadline": np.int64, "service_time": np.int64}
+STATION_COLUMNS = {"id": np.int64, "x": np.float64, "y": np.float64, "ports": np.int64,
+                   "charge_rate_w": np.float64}
+
+_ENTITIES = (("bike", BIKE_COLUMNS, Bike), ("order", ORDER_COLUMNS, Order),
+             ("station", STATION_COLUMNS, Station))
+
+
+def scenario_key(sc: dict, seed: int = RANDOM_SEED) -> str:
+    """Content address of a generated scenario: hash of (parameters, seed, generator version)."""
+    blob = json.dumps({"params": sc, "seed": seed, "generator": GENERATOR_VERSION},
+                      sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:32]
+
+
+def _to_arrays(bikes, orders, stations) -> Dict[str, np.ndarray]:
+    arrays: Dict[str, np.ndarray] = {}
+    for (prefix, cols, _), items in zip(_ENTITIES, (bikes, orders, stations)):
+        for k, dt in cols.items():
+            arrays[f"{prefix}_{k}"] = np.array([getattr(it, k) for it in items], dtype=dt)
+    return arrays
+
+
+def _from_arrays(arrays) -> Tuple[List[Bike], List[Order], List[Station]]:
+    out = []
+    for prefix, cols, cls in _ENTITIES:
+        columns = [arrays[f"{prefix}_{k}"].tolist() for k in cols]
+        out.append([cls(*row) for row in zip(*columns)])
+    return out[0], out[1], out[2]
+
+
+def save_scenario(path: str, bikes, orders, stations) -> None:
+    """Write atomically (temp file + rename), so concurrent writers and readers never see a partial file."""
+    d = os.path.dirname(path) or "."
+    os.makedirs(d, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=d, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **_to_arrays(bikes, orders, stations))
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def load_scenario(path: str) -> Tuple[List[Bike], List[Order], List[Station]]:
+    with np.load(path, allow_pickle=False) as z:
+        return _from_arrays(z)
+
+
+def cached_scenario(sc: dict, seed: int = RANDOM_SEED,
+                    cache_dir: str = CACHE_DIR) -> Tuple[List[Bike], List[Order], List[Station]]:
+    """
+    generate_scenario(sc, seed), but each (parameters, seed, generator
+    version) is generated once and stored as <cache_dir>/<key>.npz; later
+    calls only read that file. Fresh objects are built on every call, so
+    runs never share state.
+    """
+    path = os.path.join(cache_dir, scenario_key(sc, seed) + ".npz")
+    if os.path.exists(path):
+        try:
+            return load_scenario(path)
+        except (OSError, ValueError, KeyError):
+            pass  # unreadable entry: regenerate and replace it
+    bikes, orders, stations = generate_scenario(sc, seed)
+    save_scenario(path, bikes, orders, stations)
+    return bikes, orders, stations
@@ -1,7 +1,16 @@
-# data/scenarios.py
 SCENARIOS = {
     "low":    {"bikes": 5,   "orders": 50,   "stations": 2},
     "medium": {"bikes": 20,  "orders": 300,  "stations": 5},
     "high":   {"bikes": 50,  "orders": 1000, "stations": 10},
 }
 
+# Larger fleets for scaling / benchmark runs (not part of the default sweeps).
+# generator="numpy" uses the vectorized generate_orders_np; horizon_min is the
+# order release window.
+CITY_SCENARIOS = {
+    "large":  {"bikes": 200,  "orders": 5000,   "stations": 20,  "horizon_min": 240, "generator": "numpy"},
+    "xlarge": {"bikes": 500,  "orders": 20000,  "stations": 50,  "horizon_min": 360, "generator": "numpy"},
+    "city":   {"bikes": 2000, "orders": 200000, "stations": 300, "horizon_min": 540, "generator": "numpy"},
+}
+
+ALL_SCENARIOS = {**SCENARIOS, **CITY_SCENARIOS}
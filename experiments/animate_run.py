@@ -1,5 +1,8 @@
 # experiments/animate_run.py
 from __future__ import annotations
+import sys
+from typing import Optional
+
 import numpy as np  # add at top of file
 
 import matplotlib.pyplot as plt
@@ -9,6 +12,7 @@ from config import SIM_DURATION_MIN, CITY_SIZE_KM, Weights, RANDOM_SEED
 from data.generate_data import set_seed, generate_bikes, generate_orders, generate_stations
 from data.scenarios import SCENARIOS
 from simulator.environment import Environment
+from simulator.trace_file import TraceReader, TraceWriter
 
 # Choose ONE policy
 from simulator.baseline_policy import baseline_decide
@@ -16,7 +20,13 @@ from simulator.baseline_policy import baseline_decide
 # from simulator.global_policy import global_decide
 
 
-def run_and_animate(scenario_name: str = "high"):
+def run_and_animate(scenario_name: str = "high", trace_path: Optional[str] = None):
+    """
+    Run one scenario and animate it. With trace_path the frames are streamed
+    to that file during the run and replayed from it (memory-mapped), which
+    keeps long / large runs out of RAM; the file can be replayed later with
+    animate_file().
+    """
     set_seed(RANDOM_SEED)
     sc = SCENARIOS[scenario_name]
 
@@ -24,19 +34,30 @@ def run_and_animate(scenario_name: str = "high"):
     orders = generate_orders(sc["orders"])
     stations = generate_stations(sc["stations"])
 
-    env = Environment(bikes=bikes, orders=orders, stations=stations, weights=Weights())
+    writer = TraceWriter(trace_path) if trace_path else None
+    env = Environment(bikes=bikes, orders=orders, stations=stations, weights=Weights(), trace=writer)
 
     # Run simulation (collects env.trace)
     env.run(SIM_DURATION_MIN, decide_fn=baseline_decide)
     # env.run(SIM_DURATION_MIN, decide_fn=heuristic_decide)
     # env.run(SIM_DURATION_MIN, decide_fn=global_decide)
 
-    trace = env.trace
+    if writer is not None:
+        writer.close()
+        animate_trace(TraceReader(trace_path), f"Scenario: {scenario_name}")
+    else:
+        animate_trace(env.trace, f"Scenario: {scenario_name}")
+
+
+def animate_file(trace_path: str):
+    animate_trace(TraceReader(trace_path), trace_path)
+
 
+def animate_trace(trace, title: str):
     fig, ax = plt.subplots()
     ax.set_xlim(0, CITY_SIZE_KM)
     ax.set_ylim(0, CITY_SIZE_KM)
-    ax.set_title(f"Scenario: {scenario_name}")
+    ax.set_title(title)
     ax.set_xlabel("x (km)")
     ax.set_ylabel("y (km)")
 
@@ -88,4 +109,8 @@ def run_and_animate(scenario_name: str = "high"):
 
 
 if __name__ == "__main__":
-    run_and_animate("high")
+    # python -m experiments.animate_run [trace_file]  replays a saved trace
+    if len(sys.argv) > 1:
+        animate_file(sys.argv[1])
+    else:
+        run_and_animate("high")
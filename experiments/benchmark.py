@@ -0,0 +1,197 @@
+# experiments/benchmark.py
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from config import SIM_DURATION_MIN, Weights, RANDOM_SEED
+from data.generate_data import generate_scenario
+from data.scenarios import ALL_SCENARIOS
+from simulator.environment import Environment
+from simulator.policy import Policy, make_policy
+
+BENCH_SCENARIOS: Dict[str, dict] = ALL_SCENARIOS
+
+BENCH_DIR = os.path.join("results", "bench")
+DEFAULT_OUT = os.path.join(BENCH_DIR, "current.json")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+
+# a case is flagged when it gets this much slower than the baseline...
+MAX_SLOWDOWN = 2.0
+# ...unless both timings are below this (seconds), where noise dominates
+NOISE_FLOOR_S = 0.05
+
+
+class _DecisionTimer(Policy):
+    """
+    Wraps a Policy and times its hooks and decide(); each decision's latency
+    (decide() plus the hooks that ran since the previous one) is kept.
+    """
+
+    def __init__(self, policy: Policy):
+        self.policy = policy
+        self.elapsed = 0.0
+        self.latencies: List[float] = []
+
+    def _timed(self, fn, *args):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.elapsed += time.perf_counter() - t0
+
+    def decide(self, env, idle_bikes):
+        self._timed(self.policy.decide, env, idle_bikes)
+        self.latencies.append(self.elapsed)
+        self.elapsed = 0.0
+
+    def on_order_released(self, env, orders):
+        self._timed(self.policy.on_order_released, env, orders)
+
+    def on_bike_idle(self, env, bikes):
+        self._timed(self.policy.on_bike_idle, env, bikes)
+
+    def on_charge_done(self, env, bikes):
+        self._timed(self.policy.on_charge_done, env, bikes)
+
+    def next_decision_time(self, env):
+        return self.policy.next_decision_time(env)
+
+
+def run_case(scenario: str, policy: str, duration_min: int = SIM_DURATION_MIN,
+             seed: int = RANDOM_SEED, mode: str = "tick") -> dict:
+    """One timed env.run(mode=mode) (meant to be called in a fresh process)."""
+    t_build = time.perf_counter()
+    bikes, orders, stations = generate_scenario(BENCH_SCENARIOS[scenario], seed)
+    env = Environment(bikes, orders, stations, Weights())
+    build_s = time.perf_counter() - t_build
+
+    timer = _DecisionTimer(make_policy(policy))
+    t0 = time.perf_counter()
+    env.run(duration_min, timer, mode=mode)
+    wall_s = time.perf_counter() - t0
+
+    lat_ms = np.array(timer.latencies) * 1e3
+    p50, p90, p99 = np.percentile(lat_ms, [50, 90, 99]) if len(lat_ms) else (0.0, 0.0, 0.0)
+    return {
+        "scenario": scenario,
+        "policy": policy,
+        "mode": mode,
+        "decisions": len(lat_ms),
+        "build_s": build_s,
+        "wall_s": wall_s,
+        "sim_min_per_s": env.t / wall_s if wall_s > 0 else None,
+        "decision_total_s": float(lat_ms.sum() / 1e3),
+        "decision_ms_p50": float(p50),
+        "decision_ms_p90": float(p90),
+        "decision_ms_p99": float(p99),
+        "decision_ms_max": float(lat_ms.max()) if len(lat_ms) else 0.0,
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        / (1024.0 ** 2 if sys.platform == "darwin" else 1024.0),
+        "orders_delivered": env.metrics()["orders_delivered"],
+    }
+
+
+def run_suite(scenarios: List[str], policies: List[str], repeat: int = 1,
+              duration_min: int = SIM_DURATION_MIN, modes: Sequence[str] = ("tick",)) -> dict:
+    """
+    Every (scenario, policy, mode) case in its own worker process (so peak
+    RSS is per case); with repeat > 1 the fastest run is kept.
+    """
+    cases: Dict[str, dict] = {}
+    for sc in scenarios:
+        for pol in policies:
+            for mode in modes:
+                best = None
+                for _ in range(repeat):
+                    with ProcessPoolExecutor(max_workers=1) as pool:
+                        r = pool.submit(run_case, sc, pol, duration_min, RANDOM_SEED, mode).result()
+                    if best is None or r["wall_s"] < best["wall_s"]:
+                        best = r
+                cases[f"{sc}/{pol}/{mode}"] = best
+                print(f"{sc:>8} {pol:<14} {mode:<5} {best['wall_s']:8.3f}s  "
+                      f"{best['sim_min_per_s']:9.1f} sim-min/s  p99 {best['decision_ms_p99']:8.3f} ms  "
+                      f"{best['peak_rss_mb']:7.1f} MB")
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "duration_min": duration_min,
+            "repeat": repeat,
+        },
+        "cases": cases,
+    }
+
+
+def compare(current: dict, baseline: dict, max_slowdown: float = MAX_SLOWDOWN) -> List[str]:
+    """Regression messages for cases slower than max_slowdown x the baseline."""
+    problems: List[str] = []
+    for key, cur in current["cases"].items():
+        base = baseline["cases"].get(key)
+        if base is None:
+            continue
+        for field in ("wall_s", "decision_ms_p99"):
+            b, c = base[field], cur[field]
+            floor = NOISE_FLOOR_S if field == "wall_s" else NOISE_FLOOR_S * 1e3
+            if max(b, c) < floor:
+                continue
+            ratio = c / b if b > 0 else float("inf")
+            if ratio > max_slowdown:
+                problems.append(f"{key}: {field} {b:.4g} -> {c:.4g} ({ratio:.2f}x)")
+    return problems
+
+
+def save_json(data: dict, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Engine / policy benchmark with regression check.")
+    ap.add_argument("--scenarios", default="low,medium,high,large")
+    ap.add_argument("--policies", default="baseline,heuristic,global")
+    ap.add_argument("--modes", default="tick,event", help="env.run modes to time")
+    ap.add_argument("--repeat", type=int, default=1)
+    ap.add_argument("--duration", type=int, default=SIM_DURATION_MIN)
+    ap.add_argument("--out", default=DEFAULT_OUT)
+    ap.add_argument("--baseline", default=DEFAULT_BASELINE)
+    ap.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    ap.add_argument("--max-slowdown", type=float, default=MAX_SLOWDOWN)
+    args = ap.parse_args(argv)
+
+    result = run_suite(args.scenarios.split(","), args.policies.split(","), args.repeat, args.duration,
+                       args.modes.split(","))
+    save_json(result, args.out)
+    print("Saved:", args.out)
+
+    if args.save_baseline:
+        save_json(result, args.baseline)
+        print("Saved baseline:", args.baseline)
+        return 0
+    if not os.path.exists(args.baseline):
+        print("No baseline at", args.baseline, "(run with --save-baseline)")
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    problems = compare(result, baseline, args.max_slowdown)
+    for p in problems:
+        print("REGRESSION", p)
+    if not problems:
+        print(f"No case more than {args.max_slowdown}x slower than the baseline.")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+# experiments/replicates.py
+from __future__ import annotations
+import argparse
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from config import Weights, RANDOM_SEED
+from data.scenarios import SCENARIOS
+from experiments.analyze_results import RunningStats, save_summary
+from experiments.run_grid import Job, make_grid, run_job, save_rows
+
+# metrics() fields that vary between replicates
+REPLICATE_METRICS = ["orders_delivered", "late_deliveries", "avg_completion_time_min",
+                     "avg_bike_downtime_min", "avg_soc"]
+
+REPLICATES_CSV = os.path.join("results", "tables", "replicates.csv")
+REPLICATE_SUMMARY_CSV = os.path.join("results", "tables", "replicate_summary.csv")
+
+
+class ReplicateStats:
+    """RunningStats per metric plus the stopping rule for one (scenario, policy)."""
+
+    def __init__(self, metrics: Sequence[str] = REPLICATE_METRICS, confidence: float = 0.95,
+                 rel_tol: float = 0.01, abs_tol: float = 0.0, min_reps: int = 5):
+        self.metrics = list(metrics)
+        self.confidence = confidence
+        self.rel_tol = rel_tol
+        self.abs_tol = abs_tol
+        self.min_reps = min_reps
+        self.stats: Dict[str, RunningStats] = {k: RunningStats() for k in self.metrics}
+        self.n = 0
+
+    def add(self, row: dict) -> None:
+        self.n += 1
+        for k, st in self.stats.items():
+            v = row.get(k)
+            if v is not None:
+                st.add(float(v))
+
+    def converged(self) -> bool:
+        """Every metric's CI half-width is within max(abs_tol, rel_tol * |mean|)."""
+        if self.n < self.min_reps:
+            return False
+        for st in self.stats.values():
+            if st.n == 0:
+                continue
+            if st.half_width(self.confidence) > max(self.abs_tol, self.rel_tol * abs(st.mean)):
+                return False
+        return True
+
+    def summary(self) -> dict:
+        out = {"replicates": self.n, "confidence": self.confidence}
+        for k, st in self.stats.items():
+            lo, hi = st.ci(self.confidence) if st.n > 1 else (None, None)
+            out[f"{k}_mean"] = st.mean if st.n else None
+            out[f"{k}_std"] = st.std
+            out[f"{k}_ci_lo"] = lo
+            out[f"{k}_ci_hi"] = hi
+        return out
+
+
+def run_replicates(scenario: str, policy: str, weights: Weights = Weights(),
+                   max_reps: int = 200, seed0: int = RANDOM_SEED, workers: Optional[int] = None,
+                   stats: Optional[ReplicateStats] = None, on_update=None) -> Tuple[ReplicateStats, List[dict]]:
+    """
+    Run replicates seed0, seed0+1, ... of one (scenario, policy) until the
+    confidence intervals are tight enough (stats.converged()) or max_reps.
+
+    Up to `workers` replicates are in flight at once; results are folded
+    into the running statistics in seed order, so the stopping point and
+    the numbers do not depend on scheduling. on_update(stats) is called
+    after each replicate is added.
+    """
+    stats = stats or ReplicateStats()
+    rows: List[dict] = []
+    jobs = [Job(scenario, policy, seed0 + i, weights) for i in range(max_reps)]
+
+    if workers == 1:
+        for job in jobs:
+            rows.append(run_job(job))
+            stats.add(rows[-1])
+            if on_update:
+                on_update(stats)
+            if stats.converged():
+                break
+        return stats, rows
+
+    n_workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        pending = {}
+        done: Dict[int, dict] = {}
+        next_job = 0
+        while len(rows) < len(jobs):
+            while next_job < len(jobs) and len(pending) < n_workers:
+                pending[pool.submit(run_job, jobs[next_job])] = next_job
+                next_job += 1
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                done[pending.pop(fut)] = fut.result()
+            stop = False
+            while len(rows) in done:
+                rows.append(done.pop(len(rows)))
+                stats.add(rows[-1])
+                if on_update:
+                    on_update(stats)
+                if stats.converged():
+                    stop = True
+                    break
+            if stop:
+                for fut in pending:
+                    fut.cancel()
+                break
+    return stats, rows
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Monte Carlo replicates with early stopping.")
+    ap.add_argument("--scenarios", default=",".join(SCENARIOS))
+    ap.add_argument("--policies", default="baseline,heuristic,global")
+    ap.add_argument("--max-reps", type=int, default=200)
+    ap.add_argument("--min-reps", type=int, default=5)
+    ap.add_argument("--rel-tol", type=float, default=0.01, help="CI half-width / |mean| to stop at")
+    ap.add_argument("--abs-tol", type=float, default=0.0)
+    ap.add_argument("--confidence", type=float, default=0.95)
+    ap.add_argument("--seed0", type=int, default=RANDOM_SEED)
+    ap.add_argument("--workers", type=int, default=None)
+    args = ap.parse_args(argv)
+
+    all_rows: List[dict] = []
+    summary: List[dict] = []
+    for job in make_grid(args.scenarios.split(","), args.policies.split(","), [args.seed0]):
+        stats = ReplicateStats(confidence=args.confidence, rel_tol=args.rel_tol,
+                               abs_tol=args.abs_tol, min_reps=args.min_reps)
+        stats, rows = run_replicates(job.scenario, job.policy, job.weights, args.max_reps,
+                                     args.seed0, args.workers, stats)
+        all_rows.extend(rows)
+        summary.append({"scenario": job.scenario, "policy": job.policy, **stats.summary()})
+        print(job.scenario, job.policy, "replicates:", stats.n,
+              "converged" if stats.converged() else "max_reps reached")
+
+    save_rows(all_rows, REPLICATES_CSV)
+    save_summary(summary, REPLICATE_SUMMARY_CSV)
+    print("Saved:", REPLICATES_CSV)
+    print("Saved:", REPLICATE_SUMMARY_CSV)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# experiments/results_store.py
+from __future__ import annotations
+import csv
+import os
+import sqlite3
+from contextlib import contextmanager
+from dataclasses import asdict, fields
+from typing import Dict, Iterable, List, Optional
+
+from config import Weights, RANDOM_SEED
+
+RESULTS_DB = os.path.join("results", "runs.sqlite")
+
+# what identifies a run; one row per key (re-running a key replaces its row)
+KEY_COLUMNS: Dict[str, str] = {
+    "scenario": "TEXT NOT NULL",
+    "policy": "TEXT NOT NULL",
+    "seed": "INTEGER NOT NULL",
+    **{f.name: "REAL NOT NULL" for f in fields(Weights)},
+}
+# Environment.metrics()
+METRIC_COLUMNS: Dict[str, str] = {
+    "time_min": "INTEGER",
+    "orders_total": "INTEGER",
+    "orders_delivered": "INTEGER",
+    "late_deliveries": "INTEGER",
+    "avg_completion_time_min": "REAL",
+    "avg_bike_downtime_min": "REAL",
+    "avg_soc": "REAL",
+}
+COLUMNS: Dict[str, str] = {**METRIC_COLUMNS, **KEY_COLUMNS}
+WEIGHT_COLUMNS = [f.name for f in fields(Weights)]
+
+# Python type per column, for typing rows read back from CSV
+COLUMN_TYPES = {k: int if v.startswith("INTEGER") else float if v.startswith("REAL") else str
+                for k, v in COLUMNS.items()}
+
+# summarize(): <metric>_avg over every run of a (scenario, policy)
+SUMMARY_METRICS = ["orders_delivered", "late_deliveries", "avg_completion_time_min",
+                   "avg_bike_downtime_min", "avg_soc"]
+
+
+class ResultsStore:
+    """
+    Run metrics in a SQLite table, keyed by (scenario, policy, seed, weights).
+
+    Any number of processes can open the same file and write at once: the
+    database runs in WAL mode, every write is one short transaction, and a
+    writer that finds the file locked waits up to `timeout` seconds.
+    """
+
+    def __init__(self, path: str = RESULTS_DB, timeout: float = 60.0):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        cols = ", ".join(f"{k} {t}" for k, t in COLUMNS.items())
+        key = ", ".join(KEY_COLUMNS)
+        with self._write():
+            self._db.execute(f"CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, {cols}, UNIQUE ({key}))")
+            self._db.execute("CREATE INDEX IF NOT EXISTS runs_policy ON runs (policy, scenario)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS runs_seed ON runs (seed)")
+            self._db.execute(f"CREATE INDEX IF NOT EXISTS runs_weights ON runs ({', '.join(WEIGHT_COLUMNS)})")
+
+    @contextmanager
+    def _write(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so concurrent
+        # writers queue on the busy timeout instead of failing mid-transaction
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def add(self, row: dict) -> None:
+        self.add_many([row])
+
+    def add_many(self, rows: Iterable[dict]) -> None:
+        """Insert runs (a row per metrics dict plus its key columns); same key replaces."""
+        rows = list(rows)
+        if not rows:
+            return
+        for row in rows:
+            unknown = set(row) - set(COLUMNS)
+            if unknown:
+                raise ValueError(f"Unknown result column(s): {', '.join(sorted(unknown))}")
+        names = list(COLUMNS)
+        sql = (f"INSERT OR REPLACE INTO runs ({', '.join(names)}) "
+               f"VALUES ({', '.join('?' for _ in names)})")
+        with self._write():
+            self._db.executemany(sql, [[row.get(k) for k in names] for row in rows])
+
+    def rows(self, scenario: Optional[str] = None, policy: Optional[str] = None,
+             seed: Optional[int] = None) -> List[dict]:
+        """Stored runs (optionally filtered), typed by the schema, in insertion order."""
+        where, args = self._where(scenario=scenario, policy=policy, seed=seed)
+        cur = self._db.execute(f"SELECT {', '.join(COLUMNS)} FROM runs{where} ORDER BY id", args)
+        return [dict(zip(COLUMNS, r)) for r in cur]
+
+    def summarize(self, scenario: Optional[str] = None, policy: Optional[str] = None) -> List[dict]:
+        """analyze_results.summarize over the stored runs, as one GROUP BY query."""
+        where, args = self._where(scenario=scenario, policy=policy)
+        avgs = ", ".join(f"AVG({m}) AS {m}_avg" for m in SUMMARY_METRICS)
+        cur = self._db.execute(
+            f"SELECT scenario, policy, {avgs} FROM runs{where} "
+            f"GROUP BY scenario, policy ORDER BY MIN(id)", args)
+        names = ["scenario", "policy"] + [f"{m}_avg" for m in SUMMARY_METRICS]
+        return [dict(zip(names, r)) for r in cur]
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    def clear(self) -> None:
+        with self._write():
+            self._db.execute("DELETE FROM runs")
+
+    def export_csv(self, out_csv: str) -> None:
+        """All runs in the runs.csv layout (metrics first, then the key columns)."""
+        os.makedirs(os.path.dirname(out_csv), exist_ok=True)
+        with open(out_csv, "w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=list(COLUMNS))
+            w.writeheader()
+            w.writerows(self.rows())
+
+    @staticmethod
+    def _where(**filters):
+        used = {k: v for k, v in filters.items() if v is not None}
+        if not used:
+            return "", []
+        return " WHERE " + " AND ".join(f"{k} = ?" for k in used), list(used.values())
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> "ResultsStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def run_key(seed: int = RANDOM_SEED, weights: Weights = Weights()) -> dict:
+    """Key columns other than scenario/policy, for results built outside run_grid."""
+    return {"seed": seed, **asdict(weights)}
+
+
+def save_metrics(metrics: dict, db_path: str = RESULTS_DB) -> None:
+    with ResultsStore(db_path) as store:
+        store.add(metrics)
@@ -0,0 +1,129 @@
+# experiments/run_grid.py
+from __future__ import annotations
+import argparse
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from functools import partial
+from typing import Iterable, List, Optional, Sequence
+
+from config import SIM_DURATION_MIN, Weights, RANDOM_SEED
+from data.scenario_cache import cached_scenario
+from data.scenarios import SCENARIOS, ALL_SCENARIOS
+from simulator.environment import Environment
+from experiments.results_store import RESULTS_DB, ResultsStore
+from simulator.policy import make_policy, policy_names
+
+# registered policy names (simulator.policy.POLICY_REGISTRY)
+POLICIES = policy_names()
+
+RESULTS_CSV = os.path.join("results", "tables", "runs.csv")
+
+
+@dataclass(frozen=True)
+class Job:
+    scenario: str
+    policy: str
+    seed: int = RANDOM_SEED
+    weights: Weights = field(default_factory=Weights)
+
+
+def make_grid(scenarios: Iterable[str], policies: Iterable[str], seeds: Iterable[int],
+              weights: Sequence[Weights] = (Weights(),)) -> List[Job]:
+    """Every (scenario, policy, seed, weights) combination, in that nesting order."""
+    jobs = [Job(sc, pol, seed, w) for sc in scenarios for pol in policies
+            for seed in seeds for w in weights]
+    for job in jobs:
+        if job.scenario not in ALL_SCENARIOS:
+            raise ValueError(f"Unknown scenario: {job.scenario}")
+        if job.policy not in POLICIES:
+            raise ValueError(f"Unknown policy: {job.policy}")
+    return jobs
+
+
+def run_job(job: Job) -> dict:
+    """
+    One simulation run. The scenario is drawn from the job's own RNG
+    stream, so the result depends only on the job, not on which worker
+    runs it or in what order. Seed RANDOM_SEED reproduces run_baseline /
+    run_global, and the same seed gives every policy the same instance,
+    generated once and then read from data/cache by every other job.
+    """
+    bikes, orders, stations = cached_scenario(ALL_SCENARIOS[job.scenario], job.seed)
+
+    env = Environment(bikes=bikes, orders=orders, stations=stations, weights=job.weights)
+    env.run(SIM_DURATION_MIN, decide_fn=make_policy(job.policy))
+
+    metrics = env.metrics()
+    metrics["scenario"] = job.scenario
+    metrics["policy"] = job.policy
+    metrics["seed"] = job.seed
+    metrics.update(asdict(job.weights))
+    return metrics
+
+
+def run_job_to_store(job: Job, db_path: str) -> dict:
+    """run_job, then record the row in the results store at db_path (from the worker)."""
+    row = run_job(job)
+    with ResultsStore(db_path) as store:
+        store.add(row)
+    return row
+
+
+def run_grid(jobs: Sequence[Job], workers: Optional[int] = None,
+             out_csv: Optional[str] = RESULTS_CSV, db_path: Optional[str] = None) -> List[dict]:
+    """
+    Run all jobs on a process pool (workers=None: one per CPU, workers=1:
+    in this process) and write the rows to out_csv in job order, in the
+    runs.csv layout analyze_results.load_metrics reads. With db_path each
+    worker also stores its row in that ResultsStore as soon as it finishes.
+    """
+    fn = partial(run_job_to_store, db_path=db_path) if db_path else run_job
+    if workers == 1 or len(jobs) <= 1:
+        rows = [fn(j) for j in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            n = workers or os.cpu_count() or 1
+            rows = list(pool.map(fn, jobs, chunksize=max(1, len(jobs) // (4 * n))))
+
+    if out_csv and rows:
+        save_rows(rows, out_csv)
+    return rows
+
+
+def save_rows(rows: List[dict], out_csv: str) -> None:
+    os.makedirs(os.path.dirname(out_csv), exist_ok=True)
+    with open(out_csv, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        w.writeheader()
+        w.writerows(rows)
+
+
+def _csv_list(s: str) -> List[str]:
+    return [x for x in s.split(",") if x]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Run a scenario x policy x seed grid in parallel.")
+    ap.add_argument("--scenarios", default=",".join(SCENARIOS))
+    ap.add_argument("--policies", default="baseline,heuristic,global")
+    ap.add_argument("--seeds", default=str(RANDOM_SEED), help="comma list or range, e.g. 0-99")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--out", default=RESULTS_CSV)
+    ap.add_argument("--db", nargs="?", const=RESULTS_DB, default=None,
+                    help=f"also store rows in a results database (default {RESULTS_DB})")
+    args = ap.parse_args(argv)
+
+    seeds: List[int] = []
+    for part in _csv_list(args.seeds):
+        lo, _, hi = part.partition("-")
+        seeds.extend(range(int(lo), int(hi) + 1) if hi else [int(lo)])
+
+    jobs = make_grid(_csv_list(args.scenarios), _csv_list(args.policies), seeds)
+    rows = run_grid(jobs, workers=args.workers, out_csv=args.out, db_path=args.db)
+    print(f"{len(rows)} runs -> {args.out}" + (f", {args.db}" if args.db else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,10 @@
 import os
 
 from data.scenarios import SCENARIOS
-from experiments.run_baseline import run_baseline, save_metrics as save_baseline
-from experiments.run_heuristic import run_heuristic, save_metrics as save_heuristic
-from experiments.analyze_results import load_metrics, summarize, save_summary, plot_metric
+from experiments.run_baseline import run_baseline
+from experiments.run_heuristic import run_heuristic
+from experiments.analyze_results import save_summary, plot_metric
+from experiments.results_store import RESULTS_DB, ResultsStore
 
 RESULTS_CSV = os.path.join("results", "tables", "runs.csv")
 SUMMARY_CSV = os.path.join("results", "tables", "summary.csv")
@@ -12,19 +13,16 @@ SUMMARY_CSV = os.path.join("results", "tables", "summary.csv")
 def main():
     # Run each scenario once for baseline + heuristic.
     # Later you can loop 10 times with different seeds for stronger statistics.
-    if os.path.exists(RESULTS_CSV):
-            os.remove(RESULTS_CSV)
-    for sc in SCENARIOS.keys():
-        
-        m1 = run_baseline(sc)
-        save_baseline(m1, RESULTS_CSV)
+    # Runs are keyed by (scenario, policy, seed, weights): a rerun replaces
+    # its old row, so nothing has to be deleted first.
+    with ResultsStore(RESULTS_DB) as store:
+        for sc in SCENARIOS.keys():
+            store.add(run_baseline(sc))
+            store.add(run_heuristic(sc))
 
-        m2 = run_heuristic(sc)
-        save_heuristic(m2, RESULTS_CSV)
-
-    rows = load_metrics(RESULTS_CSV)
-    summ = summarize(rows)
-    save_summary(summ, SUMMARY_CSV)
+        summ = store.summarize()
+        save_summary(summ, SUMMARY_CSV)
+        store.export_csv(RESULTS_CSV)
 
     # plots
     #plot_metric(summ, "orders_delivered_avg", os.path.join("results", "plots", "orders_delivered.png"))
@@ -32,6 +30,7 @@ def main():
     #plot_metric(summ, "avg_bike_downtime_min_avg", os.path.join("results", "plots", "downtime.png"))
 
     print("Done.")
+    print("Saved:", RESULTS_DB)
     print("Saved:", RESULTS_CSV)
     print("Saved:", SUMMARY_CSV)
 
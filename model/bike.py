@@ -1,29 +1,137 @@
 # model/bike.py
 from __future__ import annotations
-from dataclasses import dataclass
 from typing import Optional
 
-@dataclass
+import numpy as np
+
+from model.fleet import (
+    BIKE_STATUSES, STATUS_CODE, NO_ID, FLOAT_FIELDS, INT_FIELDS, ID_FIELDS, STATIC_FIELDS,
+    BikeStatus, FleetState
+)
+
+_FIELDS = ("id", "x", "y", "soc", "battery_wh", "wh_per_km", "speed_kmph", "charge_target_soc",
+           "status", "target_order_id", "target_station_id",
+           "remaining_travel_min", "remaining_service_min", "remaining_charge_min",
+           "downtime_min", "delivered_count")
+
+
 class Bike:
-    id: int
-    x: float
-    y: float
-    soc: float                 # 0..1
-    battery_wh: float
-    wh_per_km: float
-    speed_kmph: float
-    charge_target_soc: float = 0.0
-
-
-    # dynamic state
-    status: str = "idle"       # idle, traveling_to_order, delivering, traveling_to_station, charging, waiting_charge
-    target_order_id: Optional[int] = None
-    target_station_id: Optional[int] = None
-
-    remaining_travel_min: int = 0
-    remaining_service_min: int = 0
-    remaining_charge_min: int = 0
-
-    # stats
-    downtime_min: int = 0
-    delivered_count: int = 0
+    """
+    One bike, stored as a row of a FleetState.
+
+    A new Bike keeps its dynamic state in a small dict of column values and
+    has no store of its own; Environment moves every bike into a shared
+    fleet store (FleetState.from_bikes), after which the dynamic attributes
+    read and write that row. id, battery_wh, wh_per_km and speed_kmph are
+    fixed for a run and stay plain attributes. The attribute API is the one
+    of the old dataclass; `status` is stored as a BikeStatus code, readable
+    directly as `status_code`.
+    """
+    __slots__ = ("_fleet", "_i", "_vals") + tuple(STATIC_FIELDS)
+
+    def __init__(self, id: int, x: float, y: float, soc: float,  # soc 0..1
+                 battery_wh: float, wh_per_km: float, speed_kmph: float,
+                 charge_target_soc: float = 0.0,
+                 # dynamic state
+                 status: str = "idle",  # idle, traveling_to_order, delivering, traveling_to_station, charging, waiting_charge
+                 target_order_id: Optional[int] = None,
+                 target_station_id: Optional[int] = None,
+                 remaining_travel_min: int = 0,
+                 remaining_service_min: int = 0,
+                 remaining_charge_min: int = 0,
+                 # stats
+                 downtime_min: int = 0,
+                 delivered_count: int = 0):
+        self._fleet: Optional[FleetState] = None
+        self._i = -1
+        # column values (as the fleet stores them) until the bike joins a fleet
+        self._vals = {"soc_per_min": 0.0}
+        values = locals()
+        for k in _FIELDS:
+            setattr(self, k, values[k])
+
+    def __repr__(self) -> str:
+        return "Bike(" + ", ".join(f"{k}={getattr(self, k)!r}" for k in _FIELDS) + ")"
+
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(getattr(self, k) == getattr(other, k) for k in _FIELDS)
+
+    __hash__ = None  # mutable, like the dataclass
+
+    def __reduce__(self):
+        # pickle the values only, not the whole fleet store
+        return _rebuild, (tuple(getattr(self, k) for k in _FIELDS),)
+
+
+def _rebuild(values) -> Bike:
+    return Bike(**dict(zip(_FIELDS, values)))
+
+
+def _read(b: Bike, name: str):
+    if b._fleet is None:
+        return b._vals[name]
+    return getattr(b._fleet, name).item(b._i)
+
+
+def _write(b: Bike, name: str, v) -> None:
+    if b._fleet is None:
+        b._vals[name] = v
+    else:
+        getattr(b._fleet, name)[b._i] = v
+
+
+def _column_property(name: str) -> property:
+    dtype = np.float64 if name in FLOAT_FIELDS else np.int64
+
+    def get(self):
+        f = self._fleet
+        if f is None:
+            return self._vals[name]
+        return getattr(f, name).item(self._i)
+
+    def set(self, v):
+        f = self._fleet
+        if f is None:
+            # through the column dtype, as a fleet row would store it
+            self._vals[name] = dtype(v).item()
+        else:
+            getattr(f, name)[self._i] = v
+
+    return property(get, set)
+
+
+def _id_property(name: str) -> property:
+    def get(self):
+        v = int(_read(self, name))
+        return None if v == NO_ID else v
+
+    def set(self, v):
+        _write(self, name, NO_ID if v is None else int(v))
+
+    return property(get, set)
+
+
+def _get_status(self) -> str:
+    return BIKE_STATUSES[_read(self, "status")]
+
+
+def _set_status(self, v: str) -> None:
+    _write(self, "status", STATUS_CODE[v])
+
+
+def _get_status_code(self) -> BikeStatus:
+    return BikeStatus(_read(self, "status"))
+
+
+def _set_status_code(self, v: int) -> None:
+    _write(self, "status", int(BikeStatus(v)))
+
+
+for _k in FLOAT_FIELDS + INT_FIELDS:
+    setattr(Bike, _k, _column_property(_k))
+for _k in ID_FIELDS:
+    setattr(Bike, _k, _id_property(_k))
+Bike.status = property(_get_status, _set_status)
+Bike.status_code = property(_get_status_code, _set_status_code)
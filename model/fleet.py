@@ -0,0 +1,91 @@
+# model/fleet.py
+from __future__ import annotations
+from enum import IntEnum
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+
+class BikeStatus(IntEnum):
+    """Integer codes behind Bike.status (the string is the lower-case name)."""
+    IDLE = 0
+    TRAVELING_TO_ORDER = 1
+    DELIVERING = 2
+    TRAVELING_TO_STATION = 3
+    CHARGING = 4
+    WAITING_CHARGE = 5
+
+
+BIKE_STATUSES = [s.name.lower() for s in BikeStatus]
+STATUS_CODE: Dict[str, int] = {s: i for i, s in enumerate(BIKE_STATUSES)}
+
+# plain ints for array comparisons in the hot paths
+IDLE, TRAVELING_TO_ORDER, DELIVERING, TRAVELING_TO_STATION, CHARGING, WAITING_CHARGE = map(int, BikeStatus)
+
+NO_ID = -1  # stands in for None in the target id columns
+
+# dynamic Bike attributes, one column each (Bike reads and writes them through the fleet)
+FLOAT_FIELDS = ("x", "y", "soc", "charge_target_soc")
+INT_FIELDS = ("remaining_travel_min", "remaining_service_min", "remaining_charge_min",
+              "downtime_min", "delivered_count")
+ID_FIELDS = ("target_order_id", "target_station_id")
+# fixed per bike: plain attributes on Bike, copied into the fleet for vector code
+STATIC_FIELDS = {"id": np.int64, "battery_wh": np.float64, "wh_per_km": np.float64,
+                 "speed_kmph": np.float64}
+
+
+class FleetState:
+    """
+    Struct-of-arrays store for bike state.
+
+    One NumPy column per dynamic Bike attribute (plus `status` as an int8
+    code and `soc_per_min`, the charge rate of the current port), one row
+    per bike. Bike objects are thin views onto a row, so policy code keeps
+    using b.soc / b.status while the environment advances every bike with a
+    few masked array operations. The fixed per-bike parameters (id,
+    battery_wh, wh_per_km, speed_kmph) are copied in by from_bikes.
+    """
+
+    def __init__(self, n: int):
+        self.n = n
+        for k, dt in STATIC_FIELDS.items():
+            setattr(self, k, np.zeros(n, dtype=dt))
+        for k in FLOAT_FIELDS:
+            setattr(self, k, np.zeros(n, dtype=np.float64))
+        for k in INT_FIELDS:
+            setattr(self, k, np.zeros(n, dtype=np.int64))
+        for k in ID_FIELDS:
+            setattr(self, k, np.full(n, NO_ID, dtype=np.int64))
+        self.status = np.zeros(n, dtype=np.int8)
+        self.soc_per_min = np.zeros(n, dtype=np.float64)
+        self.bikes: List = []
+
+    @classmethod
+    def from_bikes(cls, bikes: Iterable) -> "FleetState":
+        """Copy the bikes' current state into one store and re-point them at it."""
+        bikes = list(bikes)
+        fleet = cls(len(bikes))
+        for k in STATIC_FIELDS:
+            getattr(fleet, k)[:] = [getattr(b, k) for b in bikes]
+        for k in FLOAT_FIELDS + INT_FIELDS + ID_FIELDS + ("status", "soc_per_min"):
+            getattr(fleet, k)[:] = [b._vals[k] if b._fleet is None else getattr(b._fleet, k)[b._i]
+                                    for b in bikes]
+        for i, b in enumerate(bikes):
+            b._fleet, b._i, b._vals = fleet, i, None
+        fleet.bikes = bikes
+        return fleet
+
+    def __len__(self) -> int:
+        return self.n
+
+    def index_of(self, bikes: Iterable) -> np.ndarray:
+        """Row numbers of the given bikes (which must belong to this fleet)."""
+        return np.fromiter((b._i for b in bikes), dtype=np.int64)
+
+    def mask(self, *statuses: int) -> np.ndarray:
+        return np.isin(self.status, statuses)
+
+    def with_status(self, status: int) -> List:
+        """Bikes currently in `status`, in fleet order."""
+        bikes = self.bikes
+        return [bikes[i] for i in np.flatnonzero(self.status == status).tolist()]
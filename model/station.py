@@ -1,9 +1,10 @@
 # model/station.py
 from __future__ import annotations
+from collections import deque
 from dataclasses import dataclass, field
-from typing import List
+from typing import Deque, List
 
-@dataclass
+@dataclass(slots=True)
 class Station:
     id: int
     x: float
@@ -12,4 +13,4 @@ class Station:
     charge_rate_w: float
 
     charging_bikes: List[int] = field(default_factory=list)
-    queue: List[int] = field(default_factory=list)
+    queue: Deque[int] = field(default_factory=deque)  # FIFO of waiting bike ids
@@ -0,0 +1,193 @@
+# simulator/assignment.py
+from __future__ import annotations
+import heapq
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+INF = float("inf")
+
+CostLike = Union[np.ndarray, Sequence[Sequence[float]]]
+
+
+def linear_assignment(cost: CostLike, feasible: Optional[np.ndarray] = None) -> List[int]:
+    """
+    Rectangular min-cost assignment (drop-in for global_policy.hungarian).
+
+    cost is R x C and does not need to be square; infeasible cells are
+    either marked False in `feasible` or given as inf/nan. The result is a
+    maximum-cardinality matching of minimum total cost, i.e. the same
+    optimum hungarian() reaches on the BIG-padded square matrix, returned as
+    assignment[row] = column (-1 if the row stays unassigned).
+
+    Successive shortest augmenting paths (Jonker-Volgenant style, with
+    dual potentials) where each Dijkstra relaxation is one array operation
+    over all columns.
+    """
+    c = np.array(cost, dtype=np.float64)
+    if c.ndim != 2:
+        raise ValueError("cost must be a 2-D matrix")
+    R, C = c.shape
+    ok = np.isfinite(c)
+    if feasible is not None:
+        ok &= np.asarray(feasible, dtype=bool)
+    if R == 0 or C == 0 or not ok.any():
+        return [-1] * R
+    c = np.where(ok, c, INF)
+
+    # potentials; matched edges stay tight, all residual reduced costs >= 0
+    col_min = np.min(c, axis=0)
+    pc = np.where(np.isfinite(col_min), np.minimum(0.0, col_min), 0.0)
+    pr = np.zeros(R)
+    p_src = 0.0
+    p_sink = float(pc.min())
+
+    row_of = np.full(C, -1, dtype=np.int64)   # column -> matched row
+    col_of = np.full(R, -1, dtype=np.int64)   # row -> matched column
+
+    while True:
+        free_rows = np.flatnonzero(col_of < 0)
+        if free_rows.size == 0:
+            break
+
+        # distances from the source; free rows are reached directly
+        d_row = np.full(R, INF)
+        d_row[free_rows] = p_src - pr[free_rows]
+        # relax every free row at once (their distances are already final)
+        sub = c[free_rows]
+        k = np.argmin(sub, axis=0)
+        d_col = sub[k, np.arange(C)] + p_src - pc
+        way = free_rows[k]               # predecessor row of each column
+        done = np.zeros(C, dtype=bool)
+        d_sink = INF
+        sink_col = -1
+
+        while True:
+            cand = np.where(done, INF, d_col)
+            j = int(np.argmin(cand))
+            dj = cand[j]
+            if dj >= d_sink:
+                break  # sink is settled
+            done[j] = True
+            r = row_of[j]
+            if r < 0:
+                # free column: edge to the sink
+                dt = dj + pc[j] - p_sink
+                if dt < d_sink:
+                    d_sink = dt
+                    sink_col = j
+                continue
+            # matched column: the tight backward edge leads to its row
+            d_row[r] = dj + (-c[r, j] + pc[j] - pr[r])
+            nd = d_row[r] + c[r] + pr[r] - pc
+            better = (nd < d_col) & ~done
+            if better.any():
+                d_col = np.where(better, nd, d_col)
+                way = np.where(better, r, way)
+
+        if sink_col < 0:
+            break  # no augmenting path left: matching is maximum
+
+        # potential update, distances capped at the sink's
+        pr += np.minimum(d_row, d_sink)
+        pc += np.minimum(d_col, d_sink)
+        p_sink += d_sink
+
+        # augment along the predecessor chain
+        j = sink_col
+        while j >= 0:
+            i = int(way[j])
+            prev = int(col_of[i])
+            col_of[i] = j
+            row_of[j] = i
+            j = prev
+
+    return [int(j) for j in col_of]
+
+
+def sparse_linear_assignment(n_cols: int, rows: Sequence[Tuple[Sequence[int], Sequence[float]]]) -> List[int]:
+    """
+    Same problem as linear_assignment on a sparse bipartite graph.
+
+    rows[i] = (columns, costs) lists the only feasible edges of row i.
+    Rows are added one at a time with a heap-based Dijkstra, so work and
+    memory follow the number of edges rather than R x C. Each row also gets
+    a private "stay unassigned" column priced above any saving a longer
+    matching could give, which keeps the result maximum-cardinality.
+    """
+    R = len(rows)
+    adj: List[List[Tuple[int, float]]] = [list(zip(cols, costs)) for cols, costs in rows]
+    all_costs = [cij for edges in adj for _, cij in edges]
+    if not all_costs:
+        return [-1] * R
+    lo, hi = min(all_costs), max(all_costs)
+    unassigned_cost = (min(R, n_cols) + 2) * (hi - lo + 1.0) + abs(hi) + abs(lo)
+    for i, edges in enumerate(adj):
+        if edges:
+            edges.append((n_cols + i, unassigned_cost))
+
+    # reduced cost of edge (i, j) is c_ij + pr[i] - pc[j] >= 0; matched edges are tight
+    pr = [-min(cij for _, cij in edges) if edges else 0.0 for edges in adj]
+    pc: Dict[int, float] = {}  # missing = 0.0 (every free column sits at 0)
+
+    row_of: Dict[int, int] = {}
+    col_of = [-1] * R
+    cost_of = [0.0] * R  # cost of each row's matched edge
+
+    for i0 in range(R):
+        if not adj[i0]:
+            continue
+
+        d_row: Dict[int, float] = {i0: 0.0}
+        d_col: Dict[int, float] = {}
+        way: Dict[int, Tuple[int, float]] = {}
+        heap: List[Tuple[float, int]] = []
+        done = set()
+
+        def relax(r: int, dr: float) -> None:
+            base = dr + pr[r]
+            for j, cij in adj[r]:
+                if j in done:
+                    continue
+                nd = base + cij - pc.get(j, 0.0)
+                if nd < d_col.get(j, INF):
+                    d_col[j] = nd
+                    way[j] = (r, cij)
+                    heapq.heappush(heap, (nd, j))
+
+        relax(i0, 0.0)
+        d_sink = INF
+        sink_col = -1
+        while heap:
+            dj, j = heapq.heappop(heap)
+            if j in done or dj > d_col[j]:
+                continue
+            done.add(j)
+            r = row_of.get(j, -1)
+            if r < 0:
+                d_sink = dj
+                sink_col = j
+                break
+            dr = dj - cost_of[r] + pc.get(j, 0.0) - pr[r]
+            d_row[r] = dr
+            relax(r, dr)
+
+        # shift potentials of everything settled before the free column
+        for i, d in d_row.items():
+            if d < d_sink:
+                pr[i] += d - d_sink
+        for j in done:
+            d = d_col[j]
+            if d < d_sink:
+                pc[j] = pc.get(j, 0.0) + d - d_sink
+
+        j = sink_col
+        while j >= 0:
+            i, cij = way[j]
+            prev = col_of[i]
+            col_of[i] = j
+            row_of[j] = i
+            cost_of[i] = cij
+            j = prev
+
+    return [j if j < n_cols else -1 for j in col_of]
@@ -1,6 +1,7 @@
 # simulator/baseline_policy.py
 from __future__ import annotations
 from config import SOC_MIN_BASELINE
+from simulator.policy import PerBikePolicy, register_policy
 from simulator.environment import Environment
 from model.bike import Bike
 
@@ -15,5 +16,9 @@ def baseline_decide(env: Environment, b: Bike) -> None:
         return
 
     # nearest order
-    o = min(active, key=lambda o: (o.x - b.x) ** 2 + (o.y - b.y) ** 2)
+    bx, by = b.x, b.y
+    o = min(active, key=lambda o: (o.x - bx) ** 2 + (o.y - by) ** 2)
     env.start_travel_to_order(b, o)
+
+
+register_policy("baseline", lambda: PerBikePolicy(baseline_decide))
@@ -0,0 +1,199 @@
+# simulator/cost_matrix.py
+from __future__ import annotations
+import math
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from model.bike import Bike
+from model.order import Order
+from simulator.road_network import RoadTravel
+
+CRITICAL_SOC = 0.15  # battery_risk_penalty default
+
+
+# relative slack within which a value counts as "on" a rounding / comparison
+# boundary; np.hypot is at most an ulp off math.hypot, far inside this
+_BOUNDARY_REL = 1e-9
+
+
+def _hypot(dx: np.ndarray, dy: np.ndarray) -> np.ndarray:
+    # math.hypot, cell by cell: for the few cells where an ulp matters
+    flat = np.fromiter(map(math.hypot, dx.ravel().tolist(), dy.ravel().tolist()),
+                       dtype=np.float64, count=dx.size)
+    return flat.reshape(dx.shape)
+
+
+def _near(a: np.ndarray, b) -> np.ndarray:
+    return np.abs(a - b) <= _BOUNDARY_REL * np.maximum(1.0, np.abs(b))
+
+
+def dist_pairs(ax: np.ndarray, ay: np.ndarray, bx: np.ndarray, by: np.ndarray,
+               road: Optional[RoadTravel] = None) -> np.ndarray:
+    """dist_km between a and b points, elementwise (the arrays broadcast)."""
+    if road is not None:
+        return road.dist_pairs(ax, ay, bx, by)
+    return _hypot(ax - bx, ay - by)
+
+
+def pairwise_dist_km(bx: np.ndarray, by: np.ndarray, ox: np.ndarray, oy: np.ndarray,
+                     road: Optional[RoadTravel] = None) -> np.ndarray:
+    """B x O matrix of dist_km values."""
+    return dist_pairs(bx[:, None], by[:, None], ox[None, :], oy[None, :], road)
+
+
+def travel_minutes(d: np.ndarray, speed: np.ndarray) -> np.ndarray:
+    """travel_time_min, elementwise (int64)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_raw = np.ceil((d / speed) * 60.0)
+    return np.where(speed > 0, np.maximum(1, t_raw), 10**9).astype(np.int64)
+
+
+def risk_penalty(soc_after: np.ndarray) -> np.ndarray:
+    """battery_risk_penalty, elementwise (same x * x arithmetic, so identical)."""
+    short = CRITICAL_SOC - soc_after
+    return np.where(soc_after < CRITICAL_SOC, short * short * 100.0, 0.0)
+
+
+NEAREST_BLOCK_CELLS = 1 << 20  # P x Q scratch per block in nearest_k
+
+
+def nearest_k(px: np.ndarray, py: np.ndarray, qx: np.ndarray, qy: np.ndarray,
+              k: int, road: Optional[RoadTravel] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The k nearest q points of every p point, closest first: (index, dist_km),
+    each P x min(k, Q). Ties go to the lower index, so with q ranked by
+    position this is the same list GridIndex.nearest returns. Like the grid,
+    "nearest" is straight-line; the dist_km values follow `road` if given.
+    """
+    k = min(k, len(qx))
+    out = np.empty((len(px), k), dtype=np.int64)
+    out_d = np.empty((len(px), k))
+    step = max(1, NEAREST_BLOCK_CELLS // max(1, len(qx)))
+    for lo in range(0, len(px), step):
+        dx = px[lo:lo + step, None] - qx[None, :]
+        dy = py[lo:lo + step, None] - qy[None, :]
+        # shortlist by squared distance, then rank the shortlist by the exact
+        # distances; the slack covers rounding differences between the two
+        if 0 < k < len(qx):
+            sq = dx * dx + dy * dy
+            kth = np.partition(sq, k - 1, axis=1)[:, k - 1]
+            r, c = np.nonzero(sq <= (kth * (1.0 + 1e-9) + 1e-12)[:, None])
+        else:
+            r, c = np.nonzero(np.ones(dx.shape, dtype=bool))
+        d = _hypot(dx[r, c], dy[r, c])
+        srt = np.lexsort((c, d, r))
+        # every row has at least k shortlisted cells: take the first k of each
+        first = np.searchsorted(r[srt], np.arange(dx.shape[0]))
+        pos = srt[first[:, None] + np.arange(k)]
+        out[lo:lo + step] = c[pos]
+        out_d[lo:lo + step] = d[pos]
+    if road is not None:
+        out_d = dist_pairs(px[:, None], py[:, None], qx[out], qy[out], road)
+    return out, out_d
+
+
+def _bike_arrays(env, bikes: List[Bike]) -> Dict[str, np.ndarray]:
+    # straight from the fleet arrays
+    f = env.fleet
+    idx = f.index_of(bikes)
+    return {
+        "x": f.x[idx],
+        "y": f.y[idx],
+        "soc": f.soc[idx],
+        "speed": f.speed_kmph[idx],
+        "wh_per_km": f.wh_per_km[idx],
+        "battery": np.maximum(1e-9, f.battery_wh[idx]),
+    }
+
+
+def _order_arrays(env, orders: List[Order]) -> Dict[str, np.ndarray]:
+    return {
+        "x": np.array([o.x for o in orders], dtype=np.float64),
+        "y": np.array([o.y for o in orders], dtype=np.float64),
+        "deadline": np.array([o.deadline for o in orders], dtype=np.int64),
+        "service": np.array([o.service_time for o in orders], dtype=np.int64),
+        "d_station": np.array([env.geo.order_station_km[o.id] for o in orders], dtype=np.float64),
+    }
+
+
+def _costs(env, bk: Dict[str, np.ndarray], ok: Dict[str, np.ndarray],
+           safety_margin: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # bk / ok arrays only need to broadcast against each other
+    soc = bk["soc"]
+    wh_per_km = bk["wh_per_km"]
+    battery = bk["battery"]
+    speed = bk["speed"]
+    soc2 = (ok["d_station"] * wh_per_km) / battery
+
+    def energy(d):
+        # energy: bike -> order, then order -> nearest station
+        soc1 = (d * wh_per_km) / battery
+        return soc1, np.minimum(1.0, soc1 + soc2 + safety_margin)
+
+    if env.road is not None:
+        d = env.road.dist_pairs(bk["x"], bk["y"], ok["x"], ok["y"])
+        soc1, required = energy(d)
+    else:
+        # np.hypot can be an ulp off math.hypot (the scalar dist_km). That only
+        # matters where a result sits on a boundary -- ceil() in travel_time_min,
+        # soc >= required, the battery-risk threshold -- so only those cells
+        # are redone with math.hypot
+        dx, dy = np.broadcast_arrays(bk["x"] - ok["x"], bk["y"] - ok["y"])
+        d = np.hypot(dx, dy)
+        soc1, required = energy(d)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t_raw = (d / speed) * 60.0
+            redo = ((speed > 0) & _near(t_raw, np.rint(t_raw))) | _near(soc, required) \
+                | _near(soc - soc1, CRITICAL_SOC)
+        if redo.any():
+            d[redo] = _hypot(dx[redo], dy[redo])
+            soc1, required = energy(d)
+    feasible = soc >= required
+
+    t_travel = travel_minutes(d, speed)
+    risk = risk_penalty(soc - soc1)
+
+    # bikes that are still busy start from a later minute (see bike_order_costs)
+    completion = bk.get("t0", env.t) + t_travel + ok["service"]
+    late = np.maximum(0, completion - ok["deadline"])
+
+    w = env.w
+    cost = w.w_travel * t_travel + w.w_late * late + w.w_battery_risk * risk
+    return cost, feasible, required
+
+
+def bike_order_costs(env, bikes: List[Bike], orders: List[Order], safety_margin: float,
+                     start: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None,
+                     ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Batched version of the per-cell cost in global_decide.
+
+    Returns (cost, feasible, required_soc), each B x O. cost holds
+    w_travel * travel + w_late * lateness + w_battery_risk * risk for every
+    pair; feasible is bike.soc >= required_soc. Travel minutes, lateness and
+    feasibility are identical to the scalar helpers (dist_km,
+    travel_time_min, energy_fraction, est_completion_time,
+    battery_risk_penalty); the float columns can be an ulp off them.
+
+    start=(x, y, t0) prices each bike from another position and minute
+    instead of where it is now (bikes that become idle later).
+    """
+    bk = _bike_arrays(env, bikes)
+    if start is not None:
+        bk["x"], bk["y"], bk["t0"] = (np.asarray(a) for a in start)
+    bk = {k: v[:, None] for k, v in bk.items()}
+    ok = {k: v[None, :] for k, v in _order_arrays(env, orders).items()}
+    return _costs(env, bk, ok, safety_margin)
+
+
+def edge_costs(env, bikes: List[Bike], orders: List[Order],
+               bike_idx: np.ndarray, order_idx: np.ndarray,
+               safety_margin: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Same as bike_order_costs, but only for the listed (bike, order) pairs;
+    returns flat arrays aligned with bike_idx / order_idx.
+    """
+    bk = {k: v[bike_idx] for k, v in _bike_arrays(env, bikes).items()}
+    ok = {k: v[order_idx] for k, v in _order_arrays(env, orders).items()}
+    return _costs(env, bk, ok, safety_margin)
@@ -3,16 +3,32 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Dict, List, Tuple, Optional
 import math
+from contextlib import nullcontext
+
+import numpy as np
 
 from config import DT_MIN, CHARGE_TARGET_SOC
 from config import Weights
 from model.bike import Bike
+from model.fleet import (
+    FleetState, IDLE, TRAVELING_TO_ORDER, DELIVERING, TRAVELING_TO_STATION, CHARGING, WAITING_CHARGE
+)
 from model.order import Order
 from model.station import Station
+from simulator.order_pool import OrderPool
+from simulator.spatial_index import GridIndex
+from simulator.geometry import StaticGeometry
+from simulator.road_network import RoadTravel
+from simulator.trace import TraceRecorder
+from simulator.profiling import StepProfiler
+from simulator.policy import Policy, as_policy
 
 Point = Tuple[float, float]
 
+_NO_PROFILE = nullcontext()
+
 def dist_km(a: Point, b: Point) -> float:
+    # straight-line km; Environment.dist_km follows the configured road model
     return math.hypot(a[0] - b[0], a[1] - b[1])
 
 def travel_time_min(distance_km: float, speed_kmph: float) -> int:
@@ -27,7 +43,8 @@ def energy_fraction(distance_km: float, bike: Bike) -> float:
 def battery_risk_penalty(soc_after: float, critical: float = 0.15) -> float:
     if soc_after >= critical:
         return 0.0
-    return (critical - soc_after) ** 2 * 100.0
+    short = critical - soc_after
+    return short * short * 100.0
 
 def lateness(arrival_time: int, deadline: int) -> int:
     return max(0, arrival_time - deadline)
@@ -38,94 +55,203 @@ class StepInfo:
     delivered_now: int
 
 class Environment:
-    def __init__(self, bikes: List[Bike], orders: List[Order], stations: List[Station], weights: Weights):
+    def __init__(self, bikes: List[Bike], orders: List[Order], stations: List[Station], weights: Weights,
+                 trace=None, profiler: Optional[StepProfiler] = None, order_stream=None,
+                 road: Optional[RoadTravel] = None):
         self.bikes: Dict[int, Bike] = {b.id: b for b in bikes}
+        # bike state lives in these arrays; the Bike objects are views onto them
+        self.fleet = FleetState.from_bikes(self.bikes.values())
         self.orders: Dict[int, Order] = {o.id: o for o in orders}
         self.stations: Dict[int, Station] = {s.id: s for s in stations}
         self.w = weights
         self.t = 0
-        self.trace = []  # list of snapshots per minute
+        # per-minute snapshots for visualization: a TraceRecorder (in memory,
+        # TraceRecorder(enabled=False) turns it off) or a trace_file.TraceWriter
+        self.trace = trace if trace is not None else TraceRecorder()
+        self.trace.bind(self)
+        self.order_pool = OrderPool(self.orders.values())
+
+        # spatial indexes: stations are static, active orders come and go
+        self.station_index = GridIndex()
+        for i, s in enumerate(self.stations.values()):
+            self.station_index.insert(s.id, s.x, s.y, s, rank=i)
+        self.order_index = GridIndex()
+
+        # optional road-network distances (simulator.road_network) instead of
+        # straight lines; stations and bike start points are its anchors.
+        # Candidate searches (the grid indexes) stay straight-line.
+        self.road = road
+        if road is not None:
+            road.add_anchors([(s.x, s.y) for s in self.stations.values()] +
+                             [(b.x, b.y) for b in self.bikes.values()])
+        self._station_list = list(self.stations.values())
+        self._station_x = np.array([s.x for s in self._station_list], dtype=np.float64)
+        self._station_y = np.array([s.y for s in self._station_list], dtype=np.float64)
+
+        # nearest station per order, station distance matrix and their energy costs
+        self.geo = StaticGeometry(self.orders.values(), self.stations.values(), self.station_index, road)
+        self.dispatch_count = 0  # start_travel_* calls so far (lets engines spot no-op decisions)
+        # optional per-phase timings and counters (see profile_report)
+        self.profiler = profiler
+        # optional source of further orders, pulled in as the clock reaches
+        # their release time (see data.saved_data.OrderStream)
+        self.order_stream = order_stream
+        # what changed since the last decision, for the Policy hooks
+        self._released: List[Order] = []
+        self._became_idle: List[Bike] = []
+        self._charge_done: List[Bike] = []
+        self._policy: Optional[Tuple[object, Policy]] = None  # (decide_fn, its Policy)
+        if order_stream is not None and getattr(self.trace, "enabled", True):
+            raise ValueError("order streaming needs the trace off: trace=TraceRecorder(enabled=False)")
 
 
     def active_orders(self) -> List[Order]:
-        #return [o for o in self.orders.values() if (not o.delivered) and (o.release_time <= self.t)]
-        return [o for o in self.orders.values()
-            if (not o.delivered) and (o.assigned_to is None) and (o.release_time <= self.t)]
+        # released, undelivered, unassigned orders (kept incrementally by the pool)
+        self._sync_orders()
+        return self.order_pool.active()
+
+    def add_orders(self, orders: List[Order]) -> None:
+        """Orders that become known mid-run (after every order already present)."""
+        for o in orders:
+            self.orders[o.id] = o
+        self.order_pool.add(orders)
+        self.geo.add_orders(orders)
+
+    def next_streamed_release(self) -> Optional[int]:
+        """Release time of the next order still in the order stream, if any."""
+        return None if self.order_stream is None else self.order_stream.peek_time()
+
+    def _sync_orders(self) -> None:
+        if self.order_stream is not None:
+            new = self.order_stream.take_until(self.t)
+            if new:
+                self.add_orders(new)
+        for o in self.order_pool.release_until(self.t):
+            self.order_index.insert(o.id, o.x, o.y, o, rank=self.order_pool.position(o))
+            self._released.append(o)
+
+    def policy_for(self, decide_fn) -> Policy:
+        """as_policy(decide_fn), remembered so a plain function is inspected once per run."""
+        cached = self._policy
+        if cached is None or cached[0] is not decide_fn:
+            cached = self._policy = (decide_fn, as_policy(decide_fn))
+        return cached[1]
 
 
     def step(self, decide_fn) -> StepInfo:
         delivered_now = 0
+        prof = self.profiler
+        if prof is not None:
+            prof.start()
 
         # 1) update bikes state
-        for b in self.bikes.values():
-            delivered_now += self._update_bike(b)
+        delivered_now += self._update_bikes()
+        if prof is not None:
+            prof.lap("bike_update")
 
         # 2) stations queue → ports
         for s in self.stations.values():
             self._process_station(s)
-        '''
-        # 3) decision for idle bikes
-        for b in self.bikes.values():
-            if b.status == "idle":
-                decide_fn(self, b)
-        '''
-        # 3) decision
-        try:
-            # global policy: decide_fn(env)
-            decide_fn(self)
-        except TypeError:
-            # per-bike policy: decide_fn(env, bike)
-            for b in self.bikes.values():
-                if b.status == "idle":
-                    decide_fn(self, b)
+        if prof is not None:
+            prof.lap("stations")
+
+        # 3) decision: report what changed, then one batch call over the idle bikes
+        policy = self.policy_for(decide_fn)
+        self._sync_orders()
+        if self._released:
+            released, self._released = self._released, []
+            policy.on_order_released(self, released)
+        if self._became_idle:
+            idle_now, self._became_idle = self._became_idle, []
+            charged, self._charge_done = self._charge_done, []
+            policy.on_bike_idle(self, idle_now)
+            if charged:
+                policy.on_charge_done(self, charged)
+        policy.decide(self, self.idle_bikes())
+        if prof is not None:
+            prof.lap("decision")
 
 
         self.t += DT_MIN
 
         # record snapshot for visualization
-        self.trace.append({
-            "t": self.t,
-            "bikes": [
-                (b.id, b.x, b.y, b.soc, b.status, b.target_order_id, b.target_station_id)
-                for b in self.bikes.values()
-            ],
-            "orders": [
-                (o.id, o.x, o.y, o.delivered, o.assigned_to, o.deadline)
-                for o in self.orders.values()
-            ],
-            "stations": [
-                (s.id, s.x, s.y, len(s.queue), len(s.charging_bikes), s.ports)
-                for s in self.stations.values()
-            ]
-        })
-
+        self.trace.record(self)
+        if prof is not None:
+            prof.lap("trace")
 
         return StepInfo(time_min=self.t, delivered_now=delivered_now)
 
-    def run(self, duration_min: int, decide_fn) -> None:
-        while self.t < duration_min:
-            self.step(decide_fn)
+    def run(self, duration_min: int, decide_fn, mode: str = "tick", fast_forward: bool = True) -> None:
+        """
+        mode="tick" steps every DT_MIN; mode="event" jumps between bike/order
+        events (see simulator.event_engine) and gives the same metrics.
+
+        In tick mode, fast_forward skips quiet stretches (no waiting order,
+        every bike idle or on a timer, and the last decision a no-op) in one
+        jump to the next minute something can happen; the trace still gets
+        every frame. fast_forward=False steps through them.
+        """
+        decide_fn = self.policy_for(decide_fn)
+        if mode == "event":
+            from simulator.event_engine import run_event_driven
+            run_event_driven(self, duration_min, decide_fn)
+        elif mode == "tick":
+            from simulator import event_engine
+            must_decide = True
+            while self.t < duration_min:
+                if fast_forward and not must_decide:
+                    ticks = event_engine.quiet_ticks(self, duration_min, decide_fn)
+                    if ticks:
+                        event_engine.fast_forward(self, ticks)
+                        if self.t >= duration_min:
+                            break
+                dispatched_before = self.dispatch_count
+                self.step(decide_fn)
+                must_decide = self.dispatch_count != dispatched_before
+        else:
+            raise ValueError(f"Unknown run mode: {mode}")
+        if self.order_stream is not None:
+            self._sync_orders()  # count every order released by the end in metrics()
+        self.trace.flush()
 
     # ----------------- mechanics -----------------
-    def _update_bike(self, b: Bike) -> int:
-        delivered_now = 0
+    def _update_bikes(self) -> int:
+        """
+        Advance every bike by one step on the fleet arrays; only bikes that
+        finish a leg, a delivery or a charge drop into per-bike Python code
+        (in fleet order, as the old per-bike loop did).
+        """
+        f = self.fleet
+        st = f.status
+        traveling = (st == TRAVELING_TO_ORDER) | (st == TRAVELING_TO_STATION)
+        delivering = st == DELIVERING
+        charging = st == CHARGING
+
+        f.remaining_travel_min[traveling] -= DT_MIN
+        f.remaining_service_min[delivering] -= DT_MIN
+        f.downtime_min[charging | (st == WAITING_CHARGE)] += DT_MIN
+        # SOC added per minute at the bike's port, capped at full
+        f.soc[charging] = np.minimum(1.0, f.soc[charging] + f.soc_per_min[charging] * DT_MIN)
+        f.remaining_charge_min[charging] -= DT_MIN
+
+        done = (traveling & (f.remaining_travel_min <= 0)) \
+            | (delivering & (f.remaining_service_min <= 0)) \
+            | (charging & ((f.soc >= f.charge_target_soc) | (f.remaining_charge_min <= 0)))
 
-        if b.status.startswith("traveling"):
-            b.remaining_travel_min -= DT_MIN
-            if b.remaining_travel_min <= 0:
-                if b.status == "traveling_to_order":
-                    o = self.orders[b.target_order_id]  # type: ignore
-                    b.x, b.y = o.x, o.y
-                    b.status = "delivering"
-                    b.remaining_service_min = o.service_time
-                elif b.status == "traveling_to_station":
-                    s = self.stations[b.target_station_id]  # type: ignore
-                    b.x, b.y = s.x, s.y
-                    self._arrive_station(b, s)
-
-        elif b.status == "delivering":
-            b.remaining_service_min -= DT_MIN
-            if b.remaining_service_min <= 0:
+        delivered_now = 0
+        for i in np.flatnonzero(done).tolist():
+            b = f.bikes[i]
+            code = st[i]
+            if code == TRAVELING_TO_ORDER:
+                o = self.orders[b.target_order_id]  # type: ignore
+                b.x, b.y = o.x, o.y
+                b.status = "delivering"
+                b.remaining_service_min = o.service_time
+            elif code == TRAVELING_TO_STATION:
+                s = self.stations[b.target_station_id]  # type: ignore
+                b.x, b.y = s.x, s.y
+                self._arrive_station(b, s)
+            elif code == DELIVERING:
                 o = self.orders[b.target_order_id]  # type: ignore
                 o.delivered = True
                 o.completion_time = self.t
@@ -134,36 +260,24 @@ class Environment:
 
                 b.target_order_id = None
                 b.status = "idle"
-                delivered_now = 1
-
-        elif b.status in ("charging", "waiting_charge"):
-            b.downtime_min += DT_MIN
-
-            if b.status == "charging":
+                delivered_now += 1
+                self._became_idle.append(b)
+            else:
+                # charging: target SOC reached (or timer done)
                 s = self.stations[b.target_station_id]  # type: ignore
-
-                # how much SOC can we add per minute?
-                soc_per_min = (s.charge_rate_w / max(1e-9, b.battery_wh)) / 60.0
-
-                # increase SOC for this time step
-                b.soc = min(1.0, b.soc + soc_per_min * DT_MIN)
-
-                b.remaining_charge_min -= DT_MIN
-
-                # stop charging once target SOC reached (or timer done)
-                if b.soc >= b.charge_target_soc or b.remaining_charge_min <= 0:
-                    if b.id in s.charging_bikes:
-                        s.charging_bikes.remove(b.id)
-                    b.target_station_id = None
-                    b.status = "idle"
-                    b.charge_target_soc = 0.0
-
+                if b.id in s.charging_bikes:
+                    s.charging_bikes.remove(b.id)
+                b.target_station_id = None
+                b.status = "idle"
+                b.charge_target_soc = 0.0
+                self._became_idle.append(b)
+                self._charge_done.append(b)
 
         return delivered_now
 
     def _process_station(self, s: Station) -> None:
         while len(s.charging_bikes) < s.ports and s.queue:
-            bike_id = s.queue.pop(0)
+            bike_id = s.queue.popleft()
             b = self.bikes[bike_id]
             s.charging_bikes.append(bike_id)
             b.status = "charging"
@@ -213,25 +327,31 @@ class Environment:
         b.remaining_charge_min = max(1, int(math.ceil(minutes)))
         b.charge_target_soc = target_soc
         b.target_station_id = s.id
+        # how much SOC can we add per minute?
+        self.fleet.soc_per_min[b._i] = (s.charge_rate_w / max(1e-9, b.battery_wh)) / 60.0
        
     
 
 
     def start_travel_to_order(self, b: Bike, o: Order) -> None:
-        d = dist_km((b.x, b.y), (o.x, o.y))
-        b.remaining_travel_min = travel_time_min(d, b.speed_kmph)
-        b.soc = max(0.0, b.soc - energy_fraction(d, b))
+        d = self.dist_km((b.x, b.y), (o.x, o.y))
+        b.remaining_travel_min = self.travel_time_min(d, b.speed_kmph)
+        b.soc = max(0.0, b.soc - self.energy_fraction(d, b))
         b.status = "traveling_to_order"
         b.target_order_id = o.id
         o.assigned_to = b.id
+        self.order_pool.remove(o)
+        self.order_index.remove(o.id)
+        self.dispatch_count += 1
 
 
     def start_travel_to_station(self, b: Bike, s: Station) -> None:
-        d = dist_km((b.x, b.y), (s.x, s.y))
-        b.remaining_travel_min = travel_time_min(d, b.speed_kmph)
-        b.soc = max(0.0, b.soc - energy_fraction(d, b))
+        d = self.dist_km((b.x, b.y), (s.x, s.y))
+        b.remaining_travel_min = self.travel_time_min(d, b.speed_kmph)
+        b.soc = max(0.0, b.soc - self.energy_fraction(d, b))
         b.status = "traveling_to_station"
         b.target_station_id = s.id
+        self.dispatch_count += 1
 
     # ----------------- evaluation -----------------
     def metrics(self) -> dict:
@@ -249,20 +369,71 @@ class Environment:
             "orders_delivered": len(delivered),
             "late_deliveries": len(late),
             "avg_completion_time_min": avg_completion,
-            "avg_bike_downtime_min": sum(b.downtime_min for b in self.bikes.values()) / max(1, len(self.bikes)),
-            "avg_soc": sum(b.soc for b in self.bikes.values()) / max(1, len(self.bikes)),
+            "avg_bike_downtime_min": sum(self.fleet.downtime_min.tolist()) / max(1, len(self.bikes)),
+            "avg_soc": sum(self.fleet.soc.tolist()) / max(1, len(self.bikes)),
         }
 
+    def profile_report(self) -> Optional[dict]:
+        """Per-phase timings and counters (None unless built with a profiler)."""
+        return self.profiler.report() if self.profiler is not None else None
+
+    def count(self, name: str, n: int = 1) -> None:
+        # profiling counter; free when no profiler is attached
+        if self.profiler is not None:
+            self.profiler.count(name, n)
+
+    def timed(self, name: str):
+        # `with env.timed("solver"):` -- a profiler section, or a no-op
+        return self.profiler.section(name) if self.profiler is not None else _NO_PROFILE
+
+    # travel model for policies: straight line, or the road model when one
+    # is configured (the same numbers start_travel_* charges)
+    def dist_km(self, a: Point, b: Point) -> float:
+        if self.road is not None:
+            return self.road.dist_km(a, b)
+        return dist_km(a, b)
+
+    def travel_time_min(self, distance_km: float, speed_kmph: float) -> int:
+        return travel_time_min(distance_km, speed_kmph)
+
+    def energy_fraction(self, distance_km: float, bike: Bike) -> float:
+        return energy_fraction(distance_km, bike)
+
     # helpers for policies
+    def idle_bikes(self) -> List[Bike]:
+        """Idle bikes in the usual env.bikes order."""
+        return self.fleet.with_status(IDLE)
+
+    # (same results and tie order as sorting by self.dist_km; grid-backed
+    # without a road model, a road-distance row over the stations with one)
     def nearest_station(self, b: Bike) -> Station:
-        return min(self.stations.values(), key=lambda s: dist_km((b.x, b.y), (s.x, s.y)))
+        return self.nearest_station_to_point(b.x, b.y)
+
+    def nearest_station_to_point(self, x: float, y: float) -> Station:
+        if self.road is None:
+            return self.station_index.nearest(x, y, 1)[0]
+        d = self.road.dist_pairs(np.float64(x), np.float64(y), self._station_x, self._station_y)
+        return self._station_list[int(d.argmin())]
 
     def station_candidates(self, b: Bike, k: int) -> List[Station]:
-        return sorted(self.stations.values(), key=lambda s: dist_km((b.x, b.y), (s.x, s.y)))[:k]
+        with self.timed("candidate_search"):
+            out = self.station_index.nearest(b.x, b.y, k)
+        self.count("station_candidates", len(out))
+        return out
 
     def order_candidates(self, b: Bike, k: int) -> List[Order]:
-        active = self.active_orders()
-        return sorted(active, key=lambda o: dist_km((b.x, b.y), (o.x, o.y)))[:k]
+        self._sync_orders()
+        with self.timed("candidate_search"):
+            out = self.order_index.nearest(b.x, b.y, k)
+        self.count("order_candidates", len(out))
+        return out
+
+    def orders_within(self, x: float, y: float, radius_km: float) -> List[Order]:
+        self._sync_orders()
+        with self.timed("candidate_search"):
+            out = self.order_index.within(x, y, radius_km)
+        self.count("orders_within", len(out))
+        return out
 
     def export_order_bike_table(self, out_csv: str) -> None:
         import os, csv
@@ -294,8 +465,8 @@ class Environment:
 
         for s in self.stations.values():
             # travel time to station
-            d = dist_km((b.x, b.y), (s.x, s.y))
-            t_travel = travel_time_min(d, b.speed_kmph)
+            d = self.dist_km((b.x, b.y), (s.x, s.y))
+            t_travel = self.travel_time_min(d, b.speed_kmph)
 
             # rough queue wait estimate
             ports = max(1, s.ports)
@@ -0,0 +1,212 @@
+# simulator/event_engine.py
+from __future__ import annotations
+import heapq
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from config import DT_MIN
+from model.bike import Bike
+from model.fleet import (
+    TRAVELING_TO_ORDER, DELIVERING, TRAVELING_TO_STATION, CHARGING, WAITING_CHARGE
+)
+
+NO_TIME = -1  # "no scheduled event" in the per-bike schedule arrays
+
+
+def _ticks_until(remaining_min: int) -> int:
+    # number of extra ticks before a countdown of remaining_min hits <= 0
+    if remaining_min <= DT_MIN:
+        return 0
+    return (remaining_min + DT_MIN - 1) // DT_MIN - 1
+
+
+def _charge_ticks(env, b: Bike) -> int:
+    """
+    Ticks until the charging bike leaves its port, replaying the exact
+    per-minute SOC additions of Environment._update_bikes.
+    """
+    s = env.stations[b.target_station_id]  # type: ignore
+    soc_per_min = (s.charge_rate_w / max(1e-9, b.battery_wh)) / 60.0
+    soc = b.soc
+    remaining = b.remaining_charge_min
+    j = 0
+    while True:
+        soc = min(1.0, soc + soc_per_min * DT_MIN)
+        remaining -= DT_MIN
+        if soc >= b.charge_target_soc or remaining <= 0:
+            return j
+        j += 1
+
+
+def next_event_time(env, b: Bike) -> Optional[int]:
+    """
+    Minute of the step in which bike b changes state on its own
+    (arrival, service completion or charge completion), or None.
+    """
+    code = b.status_code
+    if code == TRAVELING_TO_ORDER or code == TRAVELING_TO_STATION:
+        return env.t + _ticks_until(b.remaining_travel_min) * DT_MIN
+    if code == DELIVERING:
+        return env.t + _ticks_until(b.remaining_service_min) * DT_MIN
+    if code == CHARGING:
+        return env.t + _charge_ticks(env, b) * DT_MIN
+    return None
+
+
+def _advance_quiet(env, ticks: int) -> None:
+    # Apply `ticks` steps in which no bike changes state and the policy is a no-op.
+    dt = ticks * DT_MIN
+    f = env.fleet
+    st = f.status
+    traveling = (st == TRAVELING_TO_ORDER) | (st == TRAVELING_TO_STATION)
+    charging = st == CHARGING
+    f.remaining_travel_min[traveling] -= dt
+    f.remaining_service_min[st == DELIVERING] -= dt
+    f.downtime_min[charging | (st == WAITING_CHARGE)] += dt
+    if charging.any():
+        soc = f.soc[charging]
+        soc_per_min = f.soc_per_min[charging]
+        # repeated adds (not soc + ticks * rate) to stay bit-identical with tick mode
+        for _ in range(ticks):
+            soc = np.minimum(1.0, soc + soc_per_min * DT_MIN)
+        f.soc[charging] = soc
+        f.remaining_charge_min[charging] -= dt
+    env.t += dt
+
+
+def quiet_ticks(env, duration_min: int, decide_fn) -> int:
+    """
+    Steps the tick engine can skip from env.t: no released order is waiting
+    and every bike is idle or in a timed travel / service / charge / queue
+    state, so nothing happens until the next bike event, order release,
+    policy wake-up (next_decision_time) or the end of the run. The caller
+    must only ask after a step whose decision was a no-op, so idle bikes
+    stay idle. Returns 0 when the current minute is not quiet.
+    """
+    env._sync_orders()
+    if len(env.order_pool):
+        return 0
+    target = duration_min
+    for t_next in (env.order_pool.next_release_time(), env.next_streamed_release()):
+        if t_next is not None:
+            target = min(target, t_next)
+    wake = getattr(decide_fn, "next_decision_time", None)
+    if wake is not None:
+        t_wake = wake(env)
+        if t_wake is not None:
+            target = min(target, t_wake)
+    # bike events: travel / service countdowns in bulk (as next_event_time),
+    # charging bikes one by one
+    f = env.fleet
+    st = f.status
+    rem = np.concatenate([f.remaining_travel_min[(st == TRAVELING_TO_ORDER) | (st == TRAVELING_TO_STATION)],
+                          f.remaining_service_min[st == DELIVERING]])
+    if len(rem):
+        ticks = np.where(rem <= DT_MIN, 0, (rem + DT_MIN - 1) // DT_MIN - 1)
+        target = min(target, env.t + int(ticks.min()) * DT_MIN)
+    for i in np.flatnonzero(st == CHARGING).tolist():
+        if target <= env.t:
+            return 0
+        target = min(target, env.t + _charge_ticks(env, f.bikes[i]) * DT_MIN)
+    if target <= env.t:
+        return 0
+    return (target - env.t + DT_MIN - 1) // DT_MIN
+
+
+def fast_forward(env, ticks: int) -> None:
+    """
+    Skip `ticks` quiet steps (see quiet_ticks). With trace recording on,
+    the state is still advanced and recorded one step at a time, so the
+    trace gets the same frames as stepping through.
+    """
+    if env.profiler is not None:
+        env.profiler.start()
+    if getattr(env.trace, "enabled", True):
+        for _ in range(ticks):
+            _advance_quiet(env, 1)
+            env.trace.record(env)
+    else:
+        _advance_quiet(env, ticks)
+    if env.profiler is not None:
+        env.profiler.lap("advance_quiet")
+        env.count("quiet_ticks", ticks)
+
+
+def run_event_driven(env, duration_min: int, decide_fn) -> None:
+    """
+    Event-driven equivalent of Environment.run.
+
+    Bike arrivals, service completions, charge completions and order releases
+    go on a priority queue and the clock jumps straight to the next one; only
+    those minutes run a full Environment.step. Everything in between is
+    advanced analytically, so metrics() and export_order_bike_table() match
+    the tick engine exactly.
+
+    Assumes the usual policy contract: only idle bikes are acted on, and a
+    decision that leaves every idle bike idle stays a no-op until a bike or
+    the order pool changes, or until the minute the policy's optional
+    next_decision_time(env) returns. The trace only gets snapshots for
+    event minutes.
+    """
+    heap: List[Tuple[int, int, int]] = []  # (time, kind, row); kind 0 = release, 1 = bike
+    for rt in sorted({o.release_time for o in env.orders.values() if o.release_time >= env.t}):
+        heapq.heappush(heap, (rt, 0, -1))
+
+    # per fleet row: time of the pending event and the status it was computed for
+    f = env.fleet
+    sched_t = np.full(len(f), NO_TIME, dtype=np.int64)
+    sched_status = np.full(len(f), -1, dtype=np.int16)
+
+    def reschedule() -> None:
+        stale = (sched_status != f.status) | ((sched_t != NO_TIME) & (sched_t < env.t))
+        for i in np.flatnonzero(stale).tolist():
+            t_ev = next_event_time(env, f.bikes[i])
+            sched_t[i] = NO_TIME if t_ev is None else t_ev
+            sched_status[i] = f.status[i]
+            if t_ev is not None:
+                heapq.heappush(heap, (t_ev, 1, i))
+
+    def next_event() -> Optional[int]:
+        while heap:
+            t_ev, kind, i = heap[0]
+            if t_ev < env.t or (kind == 1 and sched_t[i] != t_ev):
+                heapq.heappop(heap)  # stale or already handled
+                continue
+            return t_ev
+        return None
+
+    wake = getattr(decide_fn, "next_decision_time", None)
+    reschedule()
+    must_decide = True
+    while env.t < duration_min:
+        if not must_decide:
+            if env.order_stream is not None:
+                # streamed orders are only known up to the clock: queue the next release
+                env._sync_orders()
+                rt = env.next_streamed_release()
+                if rt is not None:
+                    heapq.heappush(heap, (rt, 0, -1))
+            if wake is not None:
+                # time-driven policies (batching windows) ask for their next step
+                t_wake = wake(env)
+                if t_wake is not None:
+                    heapq.heappush(heap, (t_wake, 0, -1))
+            t_ev = next_event()
+            target = duration_min if t_ev is None else min(t_ev, duration_min)
+            if target > env.t:
+                ticks = (target - env.t + DT_MIN - 1) // DT_MIN
+                if env.profiler is not None:
+                    env.profiler.start()
+                _advance_quiet(env, ticks)
+                if env.profiler is not None:
+                    env.profiler.lap("advance_quiet")
+                    env.count("quiet_ticks", ticks)
+                if env.t >= duration_min:
+                    break
+
+        dispatched_before = env.dispatch_count
+        env.step(decide_fn)
+        # rerun the policy next minute if it just did something
+        must_decide = env.dispatch_count != dispatched_before
+        reschedule()
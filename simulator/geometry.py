@@ -0,0 +1,116 @@
+# simulator/geometry.py
+from __future__ import annotations
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from model.bike import Bike
+from model.order import Order
+from model.station import Station
+from simulator.road_network import RoadTravel
+from simulator.spatial_index import GridIndex
+
+
+def nearest_point_index(qx: List[float], qy: List[float], px: List[float], py: List[float],
+                        chunk: int = 2048) -> List[int]:
+    """
+    For every query point, the index of the nearest of the points (px, py):
+    the smallest math.hypot distance, ties to the lower index -- what a
+    GridIndex ranked by position returns. Distances are compared in bulk
+    with NumPy; rows where several points come within rounding of the
+    minimum are settled with math.hypot.
+    """
+    pxa = np.asarray(px, dtype=np.float64)
+    pya = np.asarray(py, dtype=np.float64)
+    out: List[int] = []
+    for lo in range(0, len(qx), chunk):
+        xs = np.asarray(qx[lo:lo + chunk], dtype=np.float64)
+        ys = np.asarray(qy[lo:lo + chunk], dtype=np.float64)
+        dx = xs[:, None] - pxa[None, :]
+        dy = ys[:, None] - pya[None, :]
+        d2 = dx * dx + dy * dy  # squared: same order as hypot up to rounding
+        m = d2.min(axis=1)
+        near = d2 <= m[:, None] * (1.0 + 1e-12) + 1e-300
+        idx = near.argmax(axis=1)
+        for r in np.flatnonzero(near.sum(axis=1) > 1).tolist():
+            x, y = qx[lo + r], qy[lo + r]
+            idx[r] = min(np.flatnonzero(near[r]).tolist(),
+                         key=lambda j: (math.hypot(x - px[j], y - py[j]), j))
+        out.extend(idx.tolist())
+    return out
+
+
+def _energy_fraction(distance_km: float, wh_per_km: float, battery_wh: float) -> float:
+    # same arithmetic as environment.energy_fraction
+    return (distance_km * wh_per_km) / max(1e-9, battery_wh)
+
+
+class StaticGeometry:
+    """
+    Lookup tables for everything that depends only on fixed coordinates.
+
+    Orders and stations never move during a run, so the nearest station to
+    each order, its distance and the energy that leg costs are computed
+    once here instead of inside the policies' cost loops. Energy tables are
+    kept per bike energy profile (wh_per_km, battery_wh), so a homogeneous
+    fleet shares one table. With a RoadTravel, distances (and so "nearest")
+    are road distances.
+    """
+
+    def __init__(self, orders: Iterable[Order], stations: Iterable[Station], station_index: GridIndex,
+                 road: Optional[RoadTravel] = None):
+        # station_index: ranked like `stations`, so nearest_point_index agrees with it
+        stations = list(stations)
+        orders = list(orders)
+
+        self._stations = stations
+        self.road = road
+        self.order_station: Dict[int, Station] = {}
+        self.order_station_km: Dict[int, float] = {}
+        self._order_station_soc: Dict[Tuple[float, float], Dict[int, float]] = {}
+        self.add_orders(orders)
+
+    def add_orders(self, orders: List[Order]) -> None:
+        """Nearest-station entries for `orders`; also used for orders streamed in mid-run."""
+        stations = self._stations
+        if not (stations and orders):
+            return
+        if self.road is None:
+            nearest = nearest_point_index([o.x for o in orders], [o.y for o in orders],
+                                          [s.x for s in stations], [s.y for s in stations])
+            km = [math.hypot(o.x - stations[j].x, o.y - stations[j].y) for o, j in zip(orders, nearest)]
+        else:
+            nearest, km = self._nearest_by_road(orders)
+        for o, j, d in zip(orders, nearest, km):
+            s = stations[j]
+            self.order_station[o.id] = s
+            self.order_station_km[o.id] = d
+            for (wh_per_km, battery_wh), table in self._order_station_soc.items():
+                table[o.id] = _energy_fraction(d, wh_per_km, battery_wh)
+
+    def _nearest_by_road(self, orders: List[Order], chunk: int = 2048) -> Tuple[List[int], List[float]]:
+        # road distance to every station, smallest first (ties to the lower index)
+        sx = np.array([s.x for s in self._stations], dtype=np.float64)
+        sy = np.array([s.y for s in self._stations], dtype=np.float64)
+        nearest: List[int] = []
+        km: List[float] = []
+        for lo in range(0, len(orders), chunk):
+            part = orders[lo:lo + chunk]
+            ox = np.array([o.x for o in part], dtype=np.float64)
+            oy = np.array([o.y for o in part], dtype=np.float64)
+            d = self.road.dist_pairs(ox[:, None], oy[:, None], sx[None, :], sy[None, :])
+            j = d.argmin(axis=1)
+            nearest.extend(j.tolist())
+            km.extend(d[np.arange(len(part)), j].tolist())
+        return nearest, km
+
+    def order_station_soc(self, b: Bike, order_id: int) -> float:
+        """SOC bike b spends going from the order to its nearest station."""
+        profile = (b.wh_per_km, b.battery_wh)
+        table = self._order_station_soc.get(profile)
+        if table is None:
+            table = {oid: _energy_fraction(d, b.wh_per_km, b.battery_wh)
+                     for oid, d in self.order_station_km.items()}
+            self._order_station_soc[profile] = table
+        return table[order_id]
@@ -1,41 +1,51 @@
 # simulator/global_policy.py
 from __future__ import annotations
-from typing import List
+import math
+import weakref
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
+
+from config import (
+    CANDIDATE_ORDERS_K, CITY_SIZE_KM, SPARSE_FALLBACK_RADIUS_KM, SPARSE_MIN_CELLS, BATCH_WINDOW_MIN,
+    BATCH_SIZE_K
+)
 from model.bike import Bike
+from model.fleet import BikeStatus, IDLE, TRAVELING_TO_ORDER, DELIVERING
 from model.order import Order
 from model.station import Station
-from simulator.environment import (
-    Environment, dist_km, travel_time_min, energy_fraction,
-    battery_risk_penalty
-)
+from simulator.environment import Environment
+from simulator.cost_matrix import bike_order_costs, edge_costs
+from simulator.assignment import linear_assignment, sparse_linear_assignment
+from simulator.policy import Policy, FleetPolicy, register_policy
 
 SAFETY_MARGIN = 0.05
 BIG = 1e9
 
 
 def est_completion_time(env: Environment, b: Bike, o: Order) -> int:
-    d = dist_km((b.x, b.y), (o.x, o.y))
-    t_travel = travel_time_min(d, b.speed_kmph)
+    d = env.dist_km((b.x, b.y), (o.x, o.y))
+    t_travel = env.travel_time_min(d, b.speed_kmph)
     return env.t + t_travel + o.service_time
 
 
 def nearest_station_to_point(env: Environment, x: float, y: float) -> Station:
-    return min(env.stations.values(), key=lambda s: dist_km((x, y), (s.x, s.y)))
+    return env.nearest_station_to_point(x, y)
 
 
 def required_soc_for_order(env: Environment, b: Bike, o: Order) -> float:
-    d1 = dist_km((b.x, b.y), (o.x, o.y))
-    soc1 = energy_fraction(d1, b)
+    d1 = env.dist_km((b.x, b.y), (o.x, o.y))
+    soc1 = env.energy_fraction(d1, b)
 
-    s2 = nearest_station_to_point(env, o.x, o.y)
-    d2 = dist_km((o.x, o.y), (s2.x, s2.y))
-    soc2 = energy_fraction(d2, b)
+    # order -> nearest station leg comes from the precomputed tables
+    soc2 = env.geo.order_station_soc(b, o.id)
 
     return min(1.0, soc1 + soc2 + SAFETY_MARGIN)
 
 
 def hungarian(cost: List[List[float]]) -> List[int]:
+    # Square O(N^3) Kuhn-Munkres, kept as the pure-Python reference;
+    # global_decide uses assignment.linear_assignment.
     n = len(cost)
     u = [0.0] * (n + 1)
     v = [0.0] * (n + 1)
@@ -83,8 +93,106 @@ def hungarian(cost: List[List[float]]) -> List[int]:
     return assignment
 
 
-def global_decide(env: Environment) -> None:
-    idle_bikes = [b for b in env.bikes.values() if b.status == "idle"]
+def _dense_assign(env: Environment, idle_bikes: List[Bike],
+                  orders: List[Order]) -> Tuple[List[Optional[Order]], List[float]]:
+    # whole bike x order matrix in one batched pass (same numbers as the scalar helpers)
+    with env.timed("cost_matrix"):
+        costs, feasible, required = bike_order_costs(env, idle_bikes, orders, SAFETY_MARGIN)
+
+    # rectangular B x O solve; infeasible pairs are simply never matched
+    env.count("assign_problems")
+    env.count("assign_cells", costs.size)
+    with env.timed("solver"):
+        assign = linear_assignment(costs, feasible)
+
+    matched = [orders[j] if j >= 0 else None for j in assign]
+    return matched, [float(r) for r in required.min(axis=1)]
+
+
+def _sparse_assign(env: Environment, idle_bikes: List[Bike], orders: List[Order],
+                   k: int) -> Tuple[List[Optional[Order]], List[float]]:
+    """
+    Assignment over each bike's k nearest orders only. Bikes left unmatched
+    while open orders remain get every order within a radius that doubles
+    each round (SPARSE_FALLBACK_RADIUS_KM up to the whole city).
+    """
+    cands: List[Dict[int, Order]] = [
+        {o.id: o for o in env.order_candidates(b, k)} for b in idle_bikes
+    ]
+    radius = SPARSE_FALLBACK_RADIUS_KM
+    max_radius = CITY_SIZE_KM * math.sqrt(2.0)
+
+    while True:
+        # flat edge list over the union of candidate orders
+        cols: Dict[int, int] = {}
+        col_orders: List[Order] = []
+        bike_idx: List[int] = []
+        order_idx: List[int] = []
+        for i, cand in enumerate(cands):
+            for oid, o in cand.items():
+                j = cols.get(oid)
+                if j is None:
+                    j = cols[oid] = len(col_orders)
+                    col_orders.append(o)
+                bike_idx.append(i)
+                order_idx.append(j)
+        bi = np.array(bike_idx, dtype=np.int64)
+        oj = np.array(order_idx, dtype=np.int64)
+        with env.timed("cost_matrix"):
+            costs, feasible, required = edge_costs(env, idle_bikes, col_orders, bi, oj, SAFETY_MARGIN)
+
+        rows: List[Tuple[List[int], List[float]]] = [([], []) for _ in idle_bikes]
+        for i, j, c in zip(bi[feasible].tolist(), oj[feasible].tolist(), costs[feasible].tolist()):
+            rows[i][0].append(j)
+            rows[i][1].append(c)
+        env.count("assign_problems")
+        env.count("assign_edges", len(bike_idx))
+        with env.timed("solver"):
+            assign = sparse_linear_assignment(len(col_orders), rows)
+
+        unmatched = [i for i, j in enumerate(assign) if j < 0]
+        n_matched = len(assign) - len(unmatched)
+        if not unmatched or n_matched >= len(orders) or radius > max_radius:
+            break
+        for i in unmatched:
+            b = idle_bikes[i]
+            for o in env.orders_within(b.x, b.y, radius):
+                cands[i].setdefault(o.id, o)
+        radius *= 2.0
+
+    min_required = [1.0] * len(idle_bikes)
+    for i, r in zip(bike_idx, required.tolist()):
+        if r < min_required[i]:
+            min_required[i] = r
+
+    matched = [col_orders[j] if j >= 0 else None for j in assign]
+    return matched, min_required
+
+
+def global_sparse_decide(env: Environment) -> None:
+    """
+    global_decide, sparse for large decisions only.
+
+    The sparse solve pays per-bike candidate queries and a pure-Python
+    solver, so it loses to the dense one on small problems: single
+    decisions measured 2.3 ms dense vs 2.5 ms sparse at 20x200 bikes x
+    orders, but 412 ms vs 26 ms at 200x2000. Decisions with fewer than
+    SPARSE_MIN_CELLS idle-bike x open-order cells therefore go dense.
+    Results differ from "global" whenever a decision goes sparse.
+    """
+    n_cells = len(env.idle_bikes()) * len(env.active_orders())
+    global_decide(env, sparse=n_cells >= SPARSE_MIN_CELLS)
+
+
+def global_decide(env: Environment, sparse: bool = False, k: int = CANDIDATE_ORDERS_K) -> None:
+    """
+    Optimal bike->order assignment over all idle bikes.
+
+    sparse=False solves the full bike x order problem; sparse=True only
+    links each bike to its k nearest orders (widening for unmatched bikes),
+    so cost grows with B*k instead of B*O.
+    """
+    idle_bikes = env.idle_bikes()
     if not idle_bikes:
         return
 
@@ -101,41 +209,21 @@ def global_decide(env: Environment) -> None:
                 env.start_travel_to_station(b, s)
         return
 
-    B = len(idle_bikes)
-    O = len(orders)
-    N = max(B, O)
-
-    cost = [[BIG for _ in range(N)] for __ in range(N)]
-
-    for i, b in enumerate(idle_bikes):
-        for j, o in enumerate(orders):
-            req = required_soc_for_order(env, b, o)
-            if b.soc < req:
-                continue
-
-            d = dist_km((b.x, b.y), (o.x, o.y))
-            t_travel = travel_time_min(d, b.speed_kmph)
-            soc_after = b.soc - energy_fraction(d, b)
-
-            completion = est_completion_time(env, b, o)
-            late = max(0, completion - o.deadline)
-
-            cost[i][j] = (
-                env.w.w_travel * t_travel +
-                env.w.w_late * late +
-                env.w.w_battery_risk * battery_risk_penalty(soc_after)
-            )
+    if sparse:
+        matched, min_required = _sparse_assign(env, idle_bikes, orders, k)
+    else:
+        matched, min_required = _dense_assign(env, idle_bikes, orders)
+    _dispatch(env, idle_bikes, matched, min_required)
 
-    assign = hungarian(cost)
 
-    assigned_any = False
+def _dispatch(env: Environment, idle_bikes: List[Bike], matched: List[Optional[Order]],
+              min_required: List[float], reserved_any: bool = False) -> None:
+    # reserved_any: the same solve also matched bikes that are not idle yet
+    assigned_any = reserved_any
     assigned_bikes = set()
 
-    for i in range(B):
-        j = assign[i]
-        if 0 <= j < O and cost[i][j] < BIG / 2:
-            b = idle_bikes[i]
-            o = orders[j]
+    for b, o in zip(idle_bikes, matched):
+        if o is not None:
             env.start_travel_to_order(b, o)
             assigned_any = True
             assigned_bikes.add(b.id)
@@ -151,14 +239,321 @@ def global_decide(env: Environment) -> None:
         return
 
     # --- Some bikes unassigned: only charge those who need it ---
-    for b in idle_bikes:
+    for i, b in enumerate(idle_bikes):
         if b.id in assigned_bikes:
             continue
-        if b.status != "idle":
+        if b.status_code != BikeStatus.IDLE:
             continue
 
-        min_req = min(required_soc_for_order(env, b, o) for o in orders)
+        min_req = min_required[i]
         if b.soc < min_req:
             s = env.best_station_for_bike(b)
             b.charge_target_soc = min(1.0, min_req)
             env.start_travel_to_station(b, s)
+
+
+def _shortlist_edges(rows: np.ndarray, cols: np.ndarray, costs: np.ndarray,
+                     n_rows: int, n_cols: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Drop edges no optimal matching can use. With R rows and C < R columns,
+    a column matched past its C cheapest edges could move to one of those
+    rows, since the other C - 1 columns hold at most C - 1 of them; so only
+    edges costing no more than the column's C-th cheapest are kept (ties
+    included), and the same per row when R < C. The optimal matchings of
+    the edge set are unchanged. n_rows / n_cols count the rows and columns
+    that have edges.
+    """
+    if n_rows == n_cols:
+        return rows, cols, costs
+    key, k = (cols, n_cols) if n_rows > n_cols else (rows, n_rows)
+    order = np.lexsort((costs, key))
+    key_sorted = key[order]
+    starts = np.flatnonzero(np.r_[True, key_sorted[1:] != key_sorted[:-1]])
+    counts = np.diff(np.r_[starts, len(key_sorted)])
+    kth = costs[order][starts + np.minimum(counts, k) - 1]
+    limit = np.empty(key.max() + 1)
+    limit[key_sorted[starts]] = kth
+    keep = costs <= limit[key]
+    return rows[keep], cols[keep], costs[keep]
+
+
+class IncrementalGlobalPolicy(Policy):
+    """
+    global_decide that carries state from one step to the next.
+
+    Every matched pair is dispatched right away, so what survives a step is
+    the idle bikes and open orders it left unmatched. The matching is
+    maximum-cardinality, so no feasible edge joins those two sets, and
+    feasibility only depends on things that stay fixed while a bike idles
+    (position, SOC) and on static order geometry. A step therefore prices
+    only the touched pairs: new or changed bikes x all open orders, and
+    leftover bikes x new orders. Their feasible pairs are kept as an edge
+    list, cut down by _shortlist_edges, and the solve runs over the bikes
+    and orders those edges reach. That gives the same optimum as the full
+    solve without pricing or storing the full B x O matrix. Each leftover
+    bike's minimum required SOC (used for the charging fallback) is cached
+    as well; a bike whose minimum came from an order that is gone is priced
+    against all orders again.
+
+    One instance per Environment run (make_policy("global_incremental")).
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self._env = None
+        self._t = -1
+        # per fleet row: left idle and unmatched by the last step, its position
+        # and SOC then, min required soc and the order id giving that min
+        self._left: Optional[np.ndarray] = None
+        self._left_x = self._left_y = self._left_soc = self._left_min = np.empty(0)
+        self._left_oid = np.empty(0, dtype=np.int64)
+        self._left_orders: set = set()
+        self.last_problem_size: Tuple[int, int] = (0, 0)
+
+    def decide(self, env: Environment, idle_bikes: List[Bike]) -> None:
+        if self._env is None or self._env() is not env or env.t < self._t:
+            self.reset()
+            self._env = weakref.ref(env)
+        self._t = env.t
+
+        orders = env.active_orders() if idle_bikes else []
+        if not idle_bikes or not orders:
+            global_decide(env)
+            self._remember(env, [], [], [])
+            return
+
+        f = env.fleet
+        idx = f.index_of(idle_bikes)
+        B, O = len(idle_bikes), len(orders)
+        order_ids = np.array([o.id for o in orders], dtype=np.int64)
+        if self._left is None:
+            full = np.ones(B, dtype=bool)
+        else:
+            left = (self._left[idx] & (f.x[idx] == self._left_x[idx])
+                    & (f.y[idx] == self._left_y[idx]) & (f.soc[idx] == self._left_soc[idx]))
+            # a leftover whose cached minimum came from an order that is gone
+            # needs its minimum over the remaining orders again
+            open_ids = set(order_ids.tolist())
+            gone = np.array([oid not in open_ids for oid in self._left_oid[idx].tolist()], dtype=bool)
+            full = ~left | gone
+        new_cols = np.flatnonzero([o.id not in self._left_orders for o in orders])
+        full_rows, part_rows = np.flatnonzero(full), np.flatnonzero(~full)
+
+        # touched pairs only: new / changed / stale bikes x all orders, the
+        # other leftover bikes x new orders; feasible ones become the edge list
+        pair_b = np.concatenate([np.repeat(full_rows, O), np.repeat(part_rows, len(new_cols))])
+        pair_o = np.concatenate([np.tile(np.arange(O), len(full_rows)), np.tile(new_cols, len(part_rows))])
+        with env.timed("cost_matrix"):
+            cost, ok, req = edge_costs(env, idle_bikes, orders, pair_b, pair_o, SAFETY_MARGIN)
+        has_row, has_col = np.zeros(B, dtype=bool), np.zeros(O, dtype=bool)
+        has_row[pair_b[ok]], has_col[pair_o[ok]] = True, True
+        bi, oj, ec = _shortlist_edges(pair_b[ok], pair_o[ok], cost[ok], int(has_row.sum()), int(has_col.sum()))
+
+        # solve over the bikes and orders the remaining edges reach
+        has_row[:], has_col[:] = False, False
+        has_row[bi], has_col[oj] = True, True
+        rows, cols = np.flatnonzero(has_row), np.flatnonzero(has_col)
+        self.last_problem_size = (len(rows), len(cols))
+        env.count("assign_problems")
+        env.count("assign_cells", len(rows) * len(cols))
+        env.count("assign_edges", len(bi))
+
+        matched: List[Optional[Order]] = [None] * B
+        if len(rows):
+            sub = np.full((len(rows), len(cols)), np.inf)
+            sub[np.searchsorted(rows, bi), np.searchsorted(cols, oj)] = ec
+            with env.timed("solver"):
+                assign = linear_assignment(sub)
+            for r, j in enumerate(assign):
+                if j >= 0:
+                    matched[rows[r]] = orders[cols[j]]
+
+        # min required soc (charging fallback), from the pairs priced above
+        # and, for leftovers, the cached minimum over the orders they had
+        min_required = np.ones(B)
+        argmin_order = np.full(B, -1, dtype=np.int64)
+        n_full = len(full_rows) * O
+        if len(full_rows):
+            r = req[:n_full].reshape(len(full_rows), O)
+            min_required[full_rows] = r.min(axis=1)
+            argmin_order[full_rows] = order_ids[r.argmin(axis=1)]
+        if len(part_rows):
+            m = self._left_min[idx[part_rows]]
+            oid = self._left_oid[idx[part_rows]]
+            if len(new_cols):
+                r = req[n_full:].reshape(len(part_rows), len(new_cols))
+                better = r.min(axis=1) < m
+                m = np.where(better, r.min(axis=1), m)
+                oid = np.where(better, order_ids[new_cols[r.argmin(axis=1)]], oid)
+            min_required[part_rows] = m
+            argmin_order[part_rows] = oid
+
+        _dispatch(env, idle_bikes, matched, min_required.tolist())
+        unmatched = [i for i, o in enumerate(matched) if o is None]
+        self._remember(env, idx[unmatched], min_required[unmatched], argmin_order[unmatched])
+
+    def _remember(self, env: Environment, rows: np.ndarray, min_required: np.ndarray,
+                  argmin_order: np.ndarray) -> None:
+        # unmatched bikes the charging fallback left idle carry over to the next step
+        f = env.fleet
+        rows = np.asarray(rows, dtype=np.int64)
+        still = f.status[rows] == IDLE
+        self._left = np.zeros(len(f), dtype=bool)
+        self._left[rows[still]] = True
+        self._left_x, self._left_y, self._left_soc = f.x.copy(), f.y.copy(), f.soc.copy()
+        self._left_min = np.ones(len(f))
+        self._left_min[rows[still]] = np.asarray(min_required)[still]
+        self._left_oid = np.full(len(f), -1, dtype=np.int64)
+        self._left_oid[rows[still]] = np.asarray(argmin_order)[still]
+        self._left_orders = {o.id for o in env.active_orders()}
+
+
+class BatchedGlobalPolicy(Policy):
+    """
+    Rolling-horizon variant of global_decide.
+
+    Instead of solving every minute, idle bikes and released orders are
+    pooled and one assignment is solved every `window_min` minutes, or
+    earlier once `batch_k` newly idle bikes or newly released orders have
+    piled up (batch_k=None: window only). The batch also holds bikes that
+    will finish their current delivery within the window: they are priced
+    from that order's location at the minute they become idle (from
+    remaining_travel_min / remaining_service_min and the service time).
+
+    Only bikes that are idle at solve time are dispatched. An order matched
+    to a bike that is still busy is held for it and dispatched the minute
+    the bike becomes idle, unless the next solve (which starts from scratch)
+    matches the order differently. Idle bikes wait for the next solve.
+
+    New idle bikes and orders are counted through the on_bike_idle /
+    on_order_released hooks; next_decision_time() gives the event engine
+    and the tick fast-forward the next window boundary. One instance per
+    Environment run (make_policy("global_batched")).
+    """
+
+    def __init__(self, window_min: int = BATCH_WINDOW_MIN, batch_k: Optional[int] = BATCH_SIZE_K,
+                 lookahead: bool = True):
+        if window_min < 1:
+            raise ValueError("window_min must be >= 1")
+        self.window_min = window_min
+        self.batch_k = batch_k
+        self.lookahead = lookahead
+        self.reset()
+
+    def reset(self) -> None:
+        self._env = None
+        self._next_solve = 0
+        self._reserved: Dict[int, int] = {}  # busy bike id -> order id held for it
+        self._new_bikes = 0  # bikes that became idle / orders released since the last solve
+        self._new_orders = 0
+        self.solves = 0
+
+    def _bind(self, env: Environment) -> None:
+        if self._env is None or self._env() is not env:
+            self.reset()
+            self._env = weakref.ref(env)
+
+    def on_order_released(self, env: Environment, orders: List[Order]) -> None:
+        self._bind(env)
+        self._new_orders += len(orders)
+
+    def on_bike_idle(self, env: Environment, bikes: List[Bike]) -> None:
+        self._bind(env)
+        self._new_bikes += len(bikes)
+
+    def next_decision_time(self, env: Environment) -> Optional[int]:
+        return max(env.t, self._next_solve)
+
+    def decide(self, env: Environment, idle_bikes: List[Bike]) -> None:
+        self._bind(env)
+        if self._reserved:
+            self._dispatch_reserved(env, idle_bikes)
+            idle_bikes = env.idle_bikes()
+        if not self._due(env):
+            return
+
+        self._next_solve = env.t + self.window_min
+        self._new_bikes = self._new_orders = 0
+        orders = env.active_orders()
+        if not orders:
+            self._reserved = {}  # nothing left to hold
+            if idle_bikes:
+                global_decide(env)  # charging top-up only
+            return
+
+        # with no bike idle yet, the soon-idle ones still get their orders held
+        busy, start = self._soon_idle(env) if self.lookahead else ([], None)
+        if not idle_bikes and not busy:
+            return
+        self.solves += 1
+        self._reserved = {}
+        n_idle = len(idle_bikes)
+        with env.timed("cost_matrix"):
+            costs, feasible, required = bike_order_costs(env, idle_bikes, orders, SAFETY_MARGIN)
+            if busy:
+                c, f, _ = bike_order_costs(env, busy, orders, SAFETY_MARGIN, start=start)
+                costs, feasible = np.vstack([costs, c]), np.vstack([feasible, f])
+        env.count("assign_problems")
+        env.count("assign_cells", costs.size)
+        env.count("batch_lookahead_bikes", len(busy))
+        with env.timed("solver"):
+            assign = linear_assignment(costs, feasible)
+
+        matched = [orders[j] if j >= 0 else None for j in assign[:n_idle]]
+        for b, j in zip(busy, assign[n_idle:]):
+            if j >= 0:
+                self._reserved[b.id] = orders[j].id
+        _dispatch(env, idle_bikes, matched, [float(r) for r in required.min(axis=1)],
+                  reserved_any=bool(self._reserved))
+
+    def _due(self, env: Environment) -> bool:
+        if env.t >= self._next_solve:
+            return True
+        k = self.batch_k
+        return k is not None and (self._new_bikes >= k or self._new_orders >= k)
+
+    def _dispatch_reserved(self, env: Environment, idle_bikes: List[Bike]) -> None:
+        # busy bikes matched by the last solve that have become idle since
+        for b in idle_bikes:
+            oid = self._reserved.pop(b.id, None)
+            if oid is None:
+                continue
+            o = env.orders[oid]
+            if o.assigned_to is None and not o.delivered:
+                env.start_travel_to_order(b, o)
+
+    def _soon_idle(self, env: Environment) -> Tuple[List[Bike], Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Bikes on a delivery that ends within the window, with where and when they become idle."""
+        f = env.fleet
+        st = f.status
+        horizon = self.window_min
+        cand = np.flatnonzero(((st == TRAVELING_TO_ORDER) & (f.remaining_travel_min < horizon))
+                              | ((st == DELIVERING) & (f.remaining_service_min <= horizon)))
+        bikes: List[Bike] = []
+        xs: List[float] = []
+        ys: List[float] = []
+        t0: List[int] = []
+        for i in cand.tolist():
+            b = f.bikes[i]
+            o = env.orders[b.target_order_id]  # type: ignore
+            if st[i] == DELIVERING:
+                ready = env.t + max(0, b.remaining_service_min)
+            else:
+                ready = env.t + max(1, b.remaining_travel_min) + o.service_time
+            if ready - env.t > horizon:
+                continue
+            bikes.append(b)
+            xs.append(o.x)
+            ys.append(o.y)
+            t0.append(ready)
+        start = (np.array(xs, dtype=np.float64), np.array(ys, dtype=np.float64),
+                 np.array(t0, dtype=np.int64))
+        return bikes, start
+
+
+register_policy("global", lambda: FleetPolicy(global_decide))
+register_policy("global_sparse", lambda: FleetPolicy(global_sparse_decide))
+register_policy("global_incremental", IncrementalGlobalPolicy)
+register_policy("global_batched", BatchedGlobalPolicy)
@@ -1,69 +1,96 @@
 # simulator/heuristic_policy.py
 from __future__ import annotations
 import math
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
+
+import numpy as np
 
 from config import CANDIDATE_ORDERS_K, CANDIDATE_STATIONS_K, CHARGE_TARGET_SOC
+from simulator.cost_matrix import edge_costs, nearest_k, risk_penalty, travel_minutes
+from simulator.policy import Policy, register_policy
 from simulator.environment import (
-    Environment, dist_km, travel_time_min, energy_fraction,
+    Environment,
     battery_risk_penalty
 )
 from model.bike import Bike
+from model.fleet import BikeStatus, IDLE
 from model.order import Order
 from model.station import Station
 
 SAFETY_MARGIN = 0.05  # 5% buffer
+AVG_CHARGE_MIN = 15  # minutes per bike ahead in a station queue, per port (rough)
+LOW_SOC_TOP_UP = 0.60  # with no orders to take, bikes below this go charge
+BATCH_MIN_BIKES = 4  # fewer idle bikes than this: numpy setup costs more than it saves
 
 
 def required_soc_for_order(env: Environment, b: Bike, o: Order) -> float:
     # bike -> order
-    d1 = dist_km((b.x, b.y), (o.x, o.y))
-    soc1 = energy_fraction(d1, b)
+    d1 = env.dist_km((b.x, b.y), (o.x, o.y))
+    soc1 = env.energy_fraction(d1, b)
 
-    # order -> nearest station after delivery (safety)
-    nearest_s = min(env.stations.values(), key=lambda s: dist_km((o.x, o.y), (s.x, s.y)))
-    d2 = dist_km((o.x, o.y), (nearest_s.x, nearest_s.y))
-    soc2 = energy_fraction(d2, b)
+    # order -> nearest station after delivery (safety), precomputed per order
+    soc2 = env.geo.order_station_soc(b, o.id)
 
     return min(1.0, soc1 + soc2 + SAFETY_MARGIN)
 
 
 def est_completion_time(env: Environment, b: Bike, o: Order) -> int:
-    d = dist_km((b.x, b.y), (o.x, o.y))
-    t_travel = travel_time_min(d, b.speed_kmph)
+    d = env.dist_km((b.x, b.y), (o.x, o.y))
+    t_travel = env.travel_time_min(d, b.speed_kmph)
     return env.t + t_travel + o.service_time
 
 
 def heuristic_decide(env: Environment, b: Bike) -> None:
-    if b.status != "idle":
+    if b.status_code != BikeStatus.IDLE:
         return
 
-    active = env.active_orders()
-    if not active:
-        # No orders: only top-up if low SOC
-        if b.soc < 0.60:
-            s = env.best_station_for_bike(b)
-            b.charge_target_soc = min(1.0, max(b.soc, CHARGE_TARGET_SOC))
-            env.start_travel_to_station(b, s)
+    if not env.active_orders():
+        _top_up(env, b)
         return
 
     orders = env.order_candidates(b, CANDIDATE_ORDERS_K)
     stations = env.station_candidates(b, CANDIDATE_STATIONS_K)
+    best, min_required = _best_option(env, b, orders, stations)
+    _dispatch(env, b, best, min_required)
+
+
+def _top_up(env: Environment, b: Bike) -> None:
+    # No orders: only top-up if low SOC
+    if b.soc < LOW_SOC_TOP_UP:
+        s = env.best_station_for_bike(b)
+        b.charge_target_soc = min(1.0, max(b.soc, CHARGE_TARGET_SOC))
+        env.start_travel_to_station(b, s)
+
 
+def _queue_wait(s: Station) -> int:
+    # queue wait estimate: bikes ahead / ports * avg charge time
+    return int(math.ceil((len(s.queue) / max(1, s.ports)) * AVG_CHARGE_MIN))
+
+
+def _best_option(env: Environment, b: Bike, orders: List[Order],
+                 stations: List[Station]) -> Tuple[Optional[Tuple[str, int]], float]:
+    """Lowest-score ("deliver", order_id) / ("charge", station_id) for b, and min_required."""
     best: Optional[Tuple[str, int]] = None
     best_score = float("inf")
 
+    # dynamic bike fields are fleet-array views: read them once
+    bx, by, soc = b.x, b.y, b.soc
+
     # ---------------- Deliver options ----------------
+    # (same arithmetic as required_soc_for_order / est_completion_time)
+    min_required = float("inf")
     for o in orders:
-        req_soc = required_soc_for_order(env, b, o)
-        if b.soc < req_soc:
+        d = env.dist_km((bx, by), (o.x, o.y))
+        soc1 = env.energy_fraction(d, b)
+        req_soc = min(1.0, soc1 + env.geo.order_station_soc(b, o.id) + SAFETY_MARGIN)
+        min_required = min(min_required, req_soc)
+        if soc < req_soc:
             continue
 
-        d = dist_km((b.x, b.y), (o.x, o.y))
-        t_travel = travel_time_min(d, b.speed_kmph)
-        soc_after = b.soc - energy_fraction(d, b)
+        t_travel = env.travel_time_min(d, b.speed_kmph)
+        soc_after = soc - soc1
 
-        completion = est_completion_time(env, b, o)
+        completion = env.t + t_travel + o.service_time
         late = max(0, completion - o.deadline)
 
         score = (
@@ -75,24 +102,13 @@ def heuristic_decide(env: Environment, b: Bike) -> None:
             best_score = score
             best = ("deliver", o.id)
 
-    # minimum SOC needed among candidate orders
-    min_required = None
-    for o in orders:
-        r = required_soc_for_order(env, b, o)
-        min_required = r if min_required is None else min(min_required, r)
-    if min_required is None:
-        min_required = 0.60
-
     # ---------------- Charge options ----------------
     for s in stations:
-        d = dist_km((b.x, b.y), (s.x, s.y))
-        t_travel = travel_time_min(d, b.speed_kmph)
-        soc_after = b.soc - energy_fraction(d, b)
-
-        # queue wait estimate: bikes ahead / ports * avg charge time
-        ahead = len(s.queue)
-        avg_charge = 15  # minutes (rough)
-        queue_wait = int(math.ceil((ahead / max(1, s.ports)) * avg_charge))
+        d = env.dist_km((bx, by), (s.x, s.y))
+        t_travel = env.travel_time_min(d, b.speed_kmph)
+        soc_after = soc - env.energy_fraction(d, b)
+
+        queue_wait = _queue_wait(s)
         downtime = t_travel + queue_wait
 
         score = (
@@ -105,11 +121,108 @@ def heuristic_decide(env: Environment, b: Bike) -> None:
             best_score = score
             best = ("charge", s.id)
 
+    return best, min_required
+
+
+def _dispatch(env: Environment, b: Bike, best: Optional[Tuple[str, int]], min_required: float) -> None:
     if best is None:
         return
 
     if best[0] == "deliver":
         env.start_travel_to_order(b, env.orders[best[1]])
     else:
+        # minimum SOC needed among candidate orders
+        if min_required == float("inf"):
+            min_required = LOW_SOC_TOP_UP
         b.charge_target_soc = min(1.0, max(b.soc, min_required))
         env.start_travel_to_station(b, env.stations[best[1]])
+
+
+def heuristic_decide_batch(env: Environment, bikes: List[Bike]) -> None:
+    """
+    heuristic_decide for every bike in `bikes`, with the same decisions.
+
+    Candidate stations of all bikes come from one nearest-k pass over the
+    fleet arrays, and every (bike, candidate order) and (bike, candidate
+    station) pair is scored in one numpy pass. Bikes then commit in list
+    order, each claiming its order as before. Stations only fill up on
+    arrival, so the station side never goes stale within a step; a bike
+    whose candidate orders were claimed by an earlier bike re-queries its
+    candidates and is scored on its own, like heuristic_decide would.
+    """
+    bikes = [b for b in bikes if b.status_code == IDLE]
+    if len(bikes) < BATCH_MIN_BIKES:
+        for b in bikes:
+            heuristic_decide(env, b)
+        return
+    n_open = len(env.active_orders())
+    if not n_open:
+        for b in bikes:
+            _top_up(env, b)
+        return
+
+    f = env.fleet
+    bi = f.index_of(bikes)
+    bx, by, soc = f.x[bi], f.y[bi], f.soc[bi]
+    rows = np.arange(len(bikes))
+
+    # ---------------- candidates ----------------
+    stations = list(env.stations.values())
+    with env.timed("candidate_search"):
+        st_idx, d = nearest_k(bx, by, np.array([s.x for s in stations]), np.array([s.y for s in stations]),
+                              CANDIDATE_STATIONS_K, env.road)
+    env.count("station_candidates", st_idx.size)
+    cands = [env.order_candidates(b, CANDIDATE_ORDERS_K) for b in bikes]
+    k = len(cands[0])  # min(CANDIDATE_ORDERS_K, open orders) for every bike
+
+    # ---------------- Deliver options ----------------
+    flat = [o for c in cands for o in c]
+    cost, feasible, required = edge_costs(env, bikes, flat, np.repeat(rows, k), np.arange(len(flat)),
+                                          SAFETY_MARGIN)
+    o_score = np.where(feasible, cost, np.inf).reshape(len(bikes), k)
+    min_required = required.reshape(len(bikes), k).min(axis=1).tolist()
+
+    # ---------------- Charge options ----------------
+    t_travel = travel_minutes(d, f.speed_kmph[bi][:, None])
+    soc_after = soc[:, None] - (d * f.wh_per_km[bi][:, None]) / np.maximum(1e-9, f.battery_wh[bi][:, None])
+    queue_wait = np.array([_queue_wait(s) for s in stations], dtype=np.int64)[st_idx]
+    downtime = t_travel + queue_wait
+    w = env.w
+    s_score = (w.w_travel * t_travel + w.w_queue * queue_wait + w.w_downtime * downtime +
+               w.w_battery_risk * risk_penalty(soc_after))
+
+    # first minimum, deliver options before charge options (heuristic_decide's strict <)
+    scores = np.concatenate([o_score, s_score], axis=1)
+    pick = scores.argmin(axis=1)
+    has_best = np.isfinite(scores[rows, pick]).tolist()
+    pick, st_idx = pick.tolist(), st_idx.tolist()
+
+    # ---------------- commit, bike by bike ----------------
+    claimed = set()
+    for i, b in enumerate(bikes):
+        if len(claimed) == n_open:
+            _top_up(env, b)
+            continue
+        if claimed and any(o.id in claimed for o in cands[i]):
+            orders = env.order_candidates(b, CANDIDATE_ORDERS_K)
+            best, req = _best_option(env, b, orders, [stations[j] for j in st_idx[i]])
+        else:
+            j = pick[i]
+            best = None
+            if has_best[i]:
+                best = ("deliver", cands[i][j].id) if j < k else ("charge", stations[st_idx[i][j - k]].id)
+            req = min_required[i]
+        _dispatch(env, b, best, req)
+        if best is not None and best[0] == "deliver":
+            claimed.add(best[1])
+
+
+class HeuristicPolicy(Policy):
+    """heuristic_decide over all idle bikes at once (heuristic_decide_batch)."""
+
+    def decide(self, env, idle_bikes: List[Bike]) -> None:
+        heuristic_decide_batch(env, idle_bikes)
+        env.count("bike_decisions", len(idle_bikes))
+
+
+register_policy("heuristic", HeuristicPolicy)
@@ -0,0 +1,71 @@
+# simulator/order_pool.py
+from __future__ import annotations
+import bisect
+import heapq
+from typing import Dict, Iterable, List, Tuple
+
+from model.order import Order
+
+
+class OrderPool:
+    """
+    Released, unassigned orders.
+
+    Orders wait on a release-time heap and move into the active set once the
+    clock reaches their release_time; assigning an order takes it out again.
+    The active set is kept sorted by the orders' original position, so
+    active() lists orders in the same order as a scan over env.orders would.
+    """
+
+    def __init__(self, orders: Iterable[Order]):
+        self._seq: List[Order] = list(orders)
+        self._pos: Dict[int, int] = {o.id: i for i, o in enumerate(self._seq)}
+        self._pending: List[Tuple[int, int]] = [
+            (o.release_time, i) for i, o in enumerate(self._seq)
+            if not o.delivered and o.assigned_to is None
+        ]
+        heapq.heapify(self._pending)
+        self._active: List[int] = []  # sorted positions into _seq
+
+    def add(self, orders: Iterable[Order]) -> None:
+        """Append orders to the sequence (after every order already known)."""
+        for o in orders:
+            i = len(self._seq)
+            self._seq.append(o)
+            self._pos[o.id] = i
+            if not o.delivered and o.assigned_to is None:
+                heapq.heappush(self._pending, (o.release_time, i))
+
+    def release_until(self, t: int) -> List[Order]:
+        """Activate every order with release_time <= t; returns the newly active ones."""
+        released: List[Order] = []
+        while self._pending and self._pending[0][0] <= t:
+            _, i = heapq.heappop(self._pending)
+            o = self._seq[i]
+            if o.delivered or o.assigned_to is not None:
+                continue
+            bisect.insort(self._active, i)
+            released.append(o)
+        return released
+
+    def next_release_time(self):
+        return self._pending[0][0] if self._pending else None
+
+    def position(self, o: Order) -> int:
+        """Index of o in the original order sequence (used for tie-breaks)."""
+        return self._pos[o.id]
+
+    def remove(self, o: Order) -> bool:
+        i = self._pos[o.id]
+        k = bisect.bisect_left(self._active, i)
+        if k < len(self._active) and self._active[k] == i:
+            del self._active[k]
+            return True
+        return False
+
+    def active(self) -> List[Order]:
+        seq = self._seq
+        return [seq[i] for i in self._active]
+
+    def __len__(self) -> int:
+        return len(self._active)
@@ -0,0 +1,123 @@
+# simulator/policy.py
+from __future__ import annotations
+import importlib
+import inspect
+from typing import Callable, Dict, List, Optional
+
+from model.bike import Bike
+from model.fleet import IDLE
+from model.order import Order
+
+
+class Policy:
+    """
+    Dispatch policy driven by Environment.step.
+
+    Every step the environment first reports what changed through the
+    hooks, then calls decide(env, idle_bikes) once with the bikes idle at
+    that minute:
+
+      on_order_released(env, orders)  orders that became visible this step
+      on_bike_idle(env, bikes)        bikes that finished a delivery or a charge
+      on_charge_done(env, bikes)      the subset of those that finished a charge
+
+    The hooks default to no-ops, so a policy only overrides what it keeps
+    incremental state for. next_decision_time(env) lets a time-driven policy
+    (e.g. one that batches) ask the event engine and the tick fast-forward
+    for a step at a given minute; None means "only when something changes".
+
+    A Policy is also callable as decide_fn(env), so it can be used wherever
+    a plain function was.
+    """
+
+    name = ""
+
+    def decide(self, env, idle_bikes: List[Bike]) -> None:
+        raise NotImplementedError
+
+    def on_order_released(self, env, orders: List[Order]) -> None:
+        pass
+
+    def on_bike_idle(self, env, bikes: List[Bike]) -> None:
+        pass
+
+    def on_charge_done(self, env, bikes: List[Bike]) -> None:
+        pass
+
+    def next_decision_time(self, env) -> Optional[int]:
+        return None
+
+    def __call__(self, env) -> None:
+        self.decide(env, env.idle_bikes())
+
+
+class FleetPolicy(Policy):
+    """A decide_fn(env) function that looks at the whole fleet itself (global_decide)."""
+
+    def __init__(self, fn: Callable, name: str = ""):
+        self.fn = fn
+        self.name = name or getattr(fn, "__name__", "")
+
+    def decide(self, env, idle_bikes: List[Bike]) -> None:
+        self.fn(env)
+
+
+class PerBikePolicy(Policy):
+    """A decide_fn(env, bike) function, called for each idle bike in fleet order."""
+
+    def __init__(self, fn: Callable, name: str = ""):
+        self.fn = fn
+        self.name = name or getattr(fn, "__name__", "")
+
+    def decide(self, env, idle_bikes: List[Bike]) -> None:
+        fn = self.fn
+        for b in idle_bikes:
+            if b.status_code == IDLE:
+                fn(env, b)
+                env.count("bike_decisions")
+
+
+def as_policy(decide_fn) -> Policy:
+    """
+    Policy for decide_fn: a Policy is returned as is; a plain function is
+    wrapped by the number of arguments it requires (env -> FleetPolicy,
+    env, bike -> PerBikePolicy), decided once from its signature.
+    """
+    if isinstance(decide_fn, Policy):
+        return decide_fn
+    if not callable(decide_fn):
+        raise TypeError(f"Not a policy: {decide_fn!r}")
+    params = [p for p in inspect.signature(decide_fn).parameters.values()
+              if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD) and p.default is p.empty]
+    if len(params) == 1:
+        return FleetPolicy(decide_fn)
+    if len(params) == 2:
+        return PerBikePolicy(decide_fn)
+    raise TypeError(f"decide_fn must take (env) or (env, bike), got {inspect.signature(decide_fn)}")
+
+
+# name -> factory returning a fresh Policy (stateful policies must not be shared between runs)
+POLICY_REGISTRY: Dict[str, Callable[[], Policy]] = {}
+
+# modules that register the built-in policies on import
+_BUILTIN_MODULES = ["simulator.baseline_policy", "simulator.heuristic_policy", "simulator.global_policy"]
+
+
+def register_policy(name: str, factory: Callable[[], Policy]) -> None:
+    if name in POLICY_REGISTRY:
+        raise ValueError(f"Policy already registered: {name}")
+    POLICY_REGISTRY[name] = factory
+
+
+def policy_names() -> List[str]:
+    for mod in _BUILTIN_MODULES:
+        importlib.import_module(mod)
+    return list(POLICY_REGISTRY)
+
+
+def make_policy(name: str) -> Policy:
+    if name not in policy_names():
+        raise ValueError(f"Unknown policy: {name}")
+    policy = POLICY_REGISTRY[name]()
+    policy.name = name
+    return policy
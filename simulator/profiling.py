@@ -0,0 +1,98 @@
+# simulator/profiling.py
+from __future__ import annotations
+from collections import defaultdict
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Dict, List, Optional
+
+STEP_PHASES = ["bike_update", "stations", "decision", "trace"]
+
+
+class StepProfiler:
+    """
+    Optional instrumentation for Environment.step.
+
+    Pass one as Environment(profiler=...). Each step is split into the
+    STEP_PHASES (plus "advance_quiet" for the event engine's fast-forward);
+    for every phase the profiler keeps total time, call count, max and,
+    with per_step=True, the time of each step. Inside a phase, named
+    sections (candidate_search, solver, ...) are timed through
+    Environment.timed(), and policies and query helpers add counters
+    (candidates returned, assignment problem sizes, ...) through
+    Environment.count(). Without a profiler none of this runs.
+    """
+
+    def __init__(self, per_step: bool = True):
+        self.per_step = per_step
+        self.total: Dict[str, float] = defaultdict(float)
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.max: Dict[str, float] = defaultdict(float)
+        self.steps: Dict[str, List[float]] = defaultdict(list)
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.section_total: Dict[str, float] = defaultdict(float)
+        self.section_calls: Dict[str, int] = defaultdict(int)
+        self._t0 = 0.0
+
+    def start(self) -> None:
+        self._t0 = perf_counter()
+
+    def lap(self, phase: str) -> None:
+        """Charge the time since start()/the previous lap() to `phase`."""
+        now = perf_counter()
+        dt = now - self._t0
+        self._t0 = now
+        self.total[phase] += dt
+        self.calls[phase] += 1
+        if dt > self.max[phase]:
+            self.max[phase] = dt
+        if self.per_step:
+            self.steps[phase].append(dt)
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] += n
+
+    @contextmanager
+    def section(self, name: str):
+        """Time a block within the current phase (not added to the phase totals)."""
+        t0 = perf_counter()
+        try:
+            yield
+        finally:
+            self.section_total[name] += perf_counter() - t0
+            self.section_calls[name] += 1
+
+    def report(self) -> dict:
+        """
+        {"phases": {phase: {total_s, calls, mean_ms, max_ms, share}},
+         "sections": {name: {total_s, calls}}, "counters": {...}, "total_s": ...};
+        per-step times stay in .steps.
+        """
+        grand = sum(self.total.values())
+        phases = {}
+        for p in STEP_PHASES + sorted(set(self.total) - set(STEP_PHASES)):
+            if p not in self.calls:
+                continue
+            n = self.calls[p]
+            phases[p] = {
+                "total_s": self.total[p],
+                "calls": n,
+                "mean_ms": self.total[p] / n * 1e3 if n else 0.0,
+                "max_ms": self.max[p] * 1e3,
+                "share": self.total[p] / grand if grand > 0 else 0.0,
+            }
+        sections = {k: {"total_s": v, "calls": self.section_calls[k]}
+                    for k, v in self.section_total.items()}
+        return {"phases": phases, "sections": sections, "counters": dict(self.counters),
+                "total_s": grand}
+
+    def format(self, report: Optional[dict] = None) -> str:
+        r = report or self.report()
+        lines = [f"{'phase':<14}{'total s':>10}{'calls':>8}{'mean ms':>10}{'max ms':>10}{'share':>8}"]
+        for p, v in r["phases"].items():
+            lines.append(f"{p:<14}{v['total_s']:>10.4f}{v['calls']:>8}{v['mean_ms']:>10.4f}"
+                         f"{v['max_ms']:>10.3f}{v['share']:>8.1%}")
+        for k, v in r["sections"].items():
+            lines.append(f"  [{k}] {v['total_s']:.4f} s in {v['calls']} calls")
+        for k, v in sorted(r["counters"].items()):
+            lines.append(f"  {k}: {v}")
+        return "\n".join(lines)
@@ -0,0 +1,279 @@
+# simulator/road_network.py
+from __future__ import annotations
+import heapq
+import json
+import math
+import random
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import (
+    CITY_SIZE_KM, RANDOM_SEED, ROAD_GRID_SPACING_KM, ROAD_DROP_FRAC, ROAD_LRU_ROWS, ROAD_SNAP_CACHE
+)
+from simulator.spatial_index import GridIndex
+
+Point = Tuple[float, float]
+Edge = Tuple[int, int, float]
+
+
+class RoadGraph:
+    """
+    Undirected road graph: node coordinates (km, city frame) and edge
+    lengths (km). Nodes are numbered by position; the graph must be connected.
+    """
+
+    def __init__(self, xs: Sequence[float], ys: Sequence[float], edges: Iterable[Edge]):
+        self.x = np.asarray(xs, dtype=np.float64)
+        self.y = np.asarray(ys, dtype=np.float64)
+        n = len(self.x)
+        if n == 0:
+            raise ValueError("Road graph has no nodes")
+        self.edges: List[Edge] = []
+        self.adj: List[List[Tuple[int, float]]] = [[] for _ in range(n)]
+        for u, v, km in edges:
+            if not (0 <= u < n and 0 <= v < n):
+                raise ValueError(f"Road edge ({u}, {v}) refers to a missing node")
+            if not km >= 0:
+                raise ValueError(f"Road edge ({u}, {v}) has length {km}")
+            self.edges.append((u, v, km))
+            self.adj[u].append((v, km))
+            self.adj[v].append((u, km))
+        if not np.isfinite(self.shortest_km(0)).all():
+            raise ValueError("Road graph is not connected")
+
+        # snapping: nearest node, ties to the lower node number
+        self.index = GridIndex()
+        for i, (x, y) in enumerate(zip(self.x.tolist(), self.y.tolist())):
+            self.index.insert(i, x, y, i, rank=i)
+
+    def __len__(self) -> int:
+        return len(self.adj)
+
+    def shortest_km(self, source: int) -> np.ndarray:
+        """Shortest-path km from `source` to every node (Dijkstra)."""
+        dist = [math.inf] * len(self.adj)
+        dist[source] = 0.0
+        heap = [(0.0, source)]
+        adj = self.adj
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for v, km in adj[u]:
+                nd = d + km
+                if nd < dist[v]:
+                    dist[v] = nd
+                    heapq.heappush(heap, (nd, v))
+        return np.array(dist, dtype=np.float64)
+
+    def snap(self, x: float, y: float) -> Tuple[int, float]:
+        """Nearest node to (x, y) and the straight-line km to reach it."""
+        node = self.index.nearest(x, y, 1)[0]
+        return node, math.hypot(x - self.x[node].item(), y - self.y[node].item())
+
+
+def grid_road_graph(size_km: float = CITY_SIZE_KM, spacing_km: float = ROAD_GRID_SPACING_KM,
+                    drop_frac: float = ROAD_DROP_FRAC, seed: int = RANDOM_SEED) -> RoadGraph:
+    """
+    Synthetic street grid over the city: nodes every spacing_km, blocks
+    joined along both axes, then drop_frac of the links that are not needed
+    to keep the grid connected removed at random (so routes detour).
+    """
+    side = int(round(size_km / spacing_km)) + 1
+    xs = [i * spacing_km for i in range(side) for _ in range(side)]
+    ys = [j * spacing_km for _ in range(side) for j in range(side)]
+    links = []
+    for i in range(side):
+        for j in range(side):
+            u = i * side + j
+            if i + 1 < side:
+                links.append((u, u + side))
+            if j + 1 < side:
+                links.append((u, u + 1))
+
+    rng = random.Random(seed)
+    rng.shuffle(links)
+    # random spanning tree first (union-find), so dropping never disconnects
+    parent = list(range(side * side))
+
+    def find(a: int) -> int:
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        return a
+
+    tree, spare = [], []
+    for u, v in links:
+        ru, rv = find(u), find(v)
+        if ru != rv:
+            parent[ru] = rv
+            tree.append((u, v))
+        else:
+            spare.append((u, v))
+    kept = tree + spare[int(round(len(spare) * drop_frac)):]
+    return RoadGraph(xs, ys, [(u, v, spacing_km) for u, v in kept])
+
+
+def load_road_graph(path: str) -> RoadGraph:
+    """
+    Graph from a JSON file: {"nodes": [[x, y], ...], "edges": [[u, v], [u, v, km], ...]}.
+    Nodes are referred to by position; an edge without km is as long as the
+    straight line between its nodes.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    nodes = raw["nodes"]
+    xs = [float(p[0]) for p in nodes]
+    ys = [float(p[1]) for p in nodes]
+    edges = []
+    for e in raw["edges"]:
+        u, v = int(e[0]), int(e[1])
+        if len(e) > 2:
+            km = float(e[2])
+        elif 0 <= u < len(nodes) and 0 <= v < len(nodes):
+            km = math.hypot(xs[u] - xs[v], ys[u] - ys[v])
+        else:
+            km = 0.0  # RoadGraph reports the missing node
+        edges.append((u, v, km))
+    return RoadGraph(xs, ys, edges)
+
+
+def save_road_graph(graph: RoadGraph, path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"nodes": [[x, y] for x, y in zip(graph.x.tolist(), graph.y.tolist())],
+                   "edges": [[u, v, km] for u, v, km in graph.edges]}, f)
+
+
+class RoadTravel:
+    """
+    dist_km over a RoadGraph, answered from caches.
+
+    A point is snapped to its nearest node; the distance between two points
+    is the straight-line km to each snapped node plus the shortest path
+    between the nodes (0 for the same point). Shortest paths come from:
+
+      anchor rows   full Dijkstra rows from every anchor node (stations and
+                    bike hubs, added by the Environment), kept for the whole
+                    run: any query with an anchor at either end is a lookup
+      LRU rows      rows from other nodes (order to order legs), at most
+                    lru_rows of them, least recently used dropped first
+
+    A query picks its row by the same rule in the scalar and the batched
+    path (first endpoint's anchor row, else the second's, else the first
+    endpoint's LRU row), so both give identical numbers. The last
+    snap_cache snapped points are remembered (least recently used dropped
+    first), so a position in use is not snapped again on every query.
+
+    An Environment holds its RoadTravel as env.road and prices travel
+    through it: env.dist_km / env.travel_time_min / env.energy_fraction and
+    env.nearest_station follow the road model when one is configured, and
+    the batched helpers (cost_matrix.dist_pairs / nearest_k) take it as an
+    argument.
+    """
+
+    def __init__(self, graph: RoadGraph, lru_rows: int = ROAD_LRU_ROWS,
+                 snap_cache: int = ROAD_SNAP_CACHE):
+        self.graph = graph
+        self.lru_rows = max(1, lru_rows)
+        self.snap_cache = max(1, snap_cache)
+        n = len(graph)
+        self._anchor_row = np.full(n, -1, dtype=np.int64)  # node -> row of _anchor_km
+        self._anchor_km = np.empty((0, n))
+        self._lru: "OrderedDict[int, np.ndarray]" = OrderedDict()
+        self._snapped: "OrderedDict[Point, Tuple[int, float]]" = OrderedDict()
+        self.lru_hits = 0
+        self.lru_misses = 0
+
+    def snap(self, x: float, y: float) -> Tuple[int, float]:
+        key = (x, y)
+        hit = self._snapped.get(key)
+        if hit is None:
+            hit = self._snapped[key] = self.graph.snap(x, y)
+            if len(self._snapped) > self.snap_cache:
+                self._snapped.popitem(last=False)
+        else:
+            self._snapped.move_to_end(key)
+        return hit
+
+    def add_anchors(self, points: Iterable[Point]) -> None:
+        """Precompute the rows of the nodes these points snap to."""
+        new = []
+        for x, y in points:
+            u = self.snap(x, y)[0]
+            if self._anchor_row[u] < 0 and u not in new:
+                new.append(u)
+        if not new:
+            return
+        self._anchor_row[new] = np.arange(len(self._anchor_km), len(self._anchor_km) + len(new))
+        self._anchor_km = np.vstack([self._anchor_km] + [self.graph.shortest_km(u) for u in new])
+        for u in new:
+            self._lru.pop(u, None)
+
+    def _row(self, u: int) -> np.ndarray:
+        row = self._lru.get(u)
+        if row is not None:
+            self._lru.move_to_end(u)
+            self.lru_hits += 1
+            return row
+        self.lru_misses += 1
+        row = self._lru[u] = self.graph.shortest_km(u)
+        if len(self._lru) > self.lru_rows:
+            self._lru.popitem(last=False)
+        return row
+
+    def node_km(self, u: int, v: int) -> float:
+        r = self._anchor_row[u]
+        if r >= 0:
+            return self._anchor_km[r, v].item()
+        r = self._anchor_row[v]
+        if r >= 0:
+            return self._anchor_km[r, u].item()
+        return self._row(u)[v].item()
+
+    def dist_km(self, a: Point, b: Point) -> float:
+        if a[0] == b[0] and a[1] == b[1]:
+            return 0.0
+        u, ka = self.snap(a[0], a[1])
+        v, kb = self.snap(b[0], b[1])
+        return ka + self.node_km(u, v) + kb
+
+    def _snap_array(self, xs: np.ndarray, ys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        snaps = [self.snap(x, y) for x, y in zip(xs.ravel().tolist(), ys.ravel().tolist())]
+        nodes = np.array([s[0] for s in snaps], dtype=np.int64).reshape(xs.shape)
+        access = np.array([s[1] for s in snaps], dtype=np.float64).reshape(xs.shape)
+        return nodes, access
+
+    def _nodes_km(self, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+        # node_km for flat node arrays, one row fetch per distinct source
+        out = np.empty(len(u))
+        ru, rv = self._anchor_row[u], self._anchor_row[v]
+        first = ru >= 0
+        out[first] = self._anchor_km[ru[first], v[first]]
+        second = ~first & (rv >= 0)
+        out[second] = self._anchor_km[rv[second], u[second]]
+        rest = np.flatnonzero(~first & ~second)
+        if len(rest):
+            rest = rest[np.argsort(u[rest], kind="stable")]
+            src = u[rest]
+            cuts = np.flatnonzero(np.diff(src)) + 1
+            for part in np.split(rest, cuts):
+                out[part] = self._row(int(u[part[0]]))[v[part]]
+        return out
+
+    def dist_pairs(self, ax: np.ndarray, ay: np.ndarray, bx: np.ndarray, by: np.ndarray) -> np.ndarray:
+        """dist_km between a and b points, elementwise (the arrays broadcast)."""
+        ax, ay, bx, by = (np.asarray(a, dtype=np.float64) for a in (ax, ay, bx, by))
+        ua, ka = self._snap_array(*np.broadcast_arrays(ax, ay))
+        ub, kb = self._snap_array(*np.broadcast_arrays(bx, by))
+        nu, nv = np.broadcast_arrays(ua, ub)
+        core = self._nodes_km(nu.ravel(), nv.ravel()).reshape(nu.shape)
+        d = ka + core + kb
+        return np.where((ax == bx) & (ay == by), 0.0, d)
+
+
+def make_road_travel(graph_file: Optional[str] = None, lru_rows: int = ROAD_LRU_ROWS) -> RoadTravel:
+    """RoadTravel over the graph in graph_file, or over grid_road_graph() without one."""
+    graph = load_road_graph(graph_file) if graph_file else grid_road_graph()
+    return RoadTravel(graph, lru_rows)
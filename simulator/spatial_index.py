@@ -0,0 +1,152 @@
+# simulator/spatial_index.py
+from __future__ import annotations
+import math
+from typing import Any, Dict, List, Tuple
+
+from config import SPATIAL_CELL_KM
+
+# below this many points (or BRUTE_FORCE_PER_K * k, for k-nearest) a plain
+# sort beats walking grid rings: sparse grids make the ring walk visit
+# mostly empty cells before it has k points
+BRUTE_FORCE_MAX = 32
+BRUTE_FORCE_PER_K = 4
+
+Cell = Tuple[int, int]
+
+
+class GridIndex:
+    """
+    Uniform grid over the city for k-nearest and radius queries.
+
+    Every point carries a rank used to break distance ties, so results come
+    back in the same order as a stable sort by dist_km over the points listed
+    in rank order.
+    """
+
+    def __init__(self, cell_km: float = SPATIAL_CELL_KM):
+        self.cell_km = cell_km
+        self._cells: Dict[Cell, Dict[int, Tuple[float, float, int]]] = {}
+        self._where: Dict[int, Cell] = {}
+        self._items: Dict[int, Any] = {}
+        # occupied cell span (only grows; used to stop ring search)
+        self._span = [0, -1, 0, -1]
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, key: int) -> bool:
+        return key in self._where
+
+    def _cell_of(self, x: float, y: float) -> Cell:
+        return int(math.floor(x / self.cell_km)), int(math.floor(y / self.cell_km))
+
+    def insert(self, key: int, x: float, y: float, item: Any, rank: int) -> None:
+        if key in self._where:
+            self.remove(key)
+        c = self._cell_of(x, y)
+        self._cells.setdefault(c, {})[key] = (x, y, rank)
+        self._where[key] = c
+        self._items[key] = item
+
+        span = self._span
+        if span[1] < span[0]:
+            self._span = [c[0], c[0], c[1], c[1]]
+        else:
+            span[0] = min(span[0], c[0])
+            span[1] = max(span[1], c[0])
+            span[2] = min(span[2], c[1])
+            span[3] = max(span[3], c[1])
+
+    def remove(self, key: int) -> bool:
+        c = self._where.pop(key, None)
+        if c is None:
+            return False
+        bucket = self._cells[c]
+        del bucket[key]
+        if not bucket:
+            del self._cells[c]
+        del self._items[key]
+        return True
+
+    def _scan_all(self, x: float, y: float) -> List[Tuple[float, int, int]]:
+        found = []
+        for bucket in self._cells.values():
+            for key, (px, py, rank) in bucket.items():
+                found.append((math.hypot(x - px, y - py), rank, key))
+        return found
+
+    def nearest(self, x: float, y: float, k: int) -> List[Any]:
+        """k nearest items to (x, y), closest first."""
+        n = len(self._where)
+        if k <= 0 or n == 0:
+            return []
+        if n <= max(BRUTE_FORCE_MAX, BRUTE_FORCE_PER_K * k):
+            found = self._scan_all(x, y)
+            found.sort()
+            return [self._items[key] for _, _, key in found[:k]]
+
+        cs = self.cell_km
+        cx, cy = self._cell_of(x, y)
+        x0, x1, y0, y1 = self._span
+        r_max = max(cx - x0, x1 - cx, cy - y0, y1 - cy, 0)
+
+        found: List[Tuple[float, int, int]] = []
+        r = 0
+        while True:
+            for c in _ring(cx, cy, r, x0, x1, y0, y1):
+                bucket = self._cells.get(c)
+                if not bucket:
+                    continue
+                for key, (px, py, rank) in bucket.items():
+                    found.append((math.hypot(x - px, y - py), rank, key))
+
+            if r >= r_max:
+                break
+            if len(found) >= k:
+                # anything not yet visited lies outside the (2r+1)^2 block
+                bound = min(x - (cx - r) * cs, (cx + r + 1) * cs - x,
+                            y - (cy - r) * cs, (cy + r + 1) * cs - y)
+                found.sort()
+                if found[k - 1][0] < bound:
+                    break
+            r += 1
+
+        found.sort()
+        return [self._items[key] for _, _, key in found[:k]]
+
+    def within(self, x: float, y: float, radius_km: float) -> List[Any]:
+        """Items with dist_km <= radius_km from (x, y), closest first."""
+        if not self._where or radius_km < 0:
+            return []
+        c0x, c0y = self._cell_of(x - radius_km, y - radius_km)
+        c1x, c1y = self._cell_of(x + radius_km, y + radius_km)
+        x0, x1, y0, y1 = self._span
+        found = []
+        for gx in range(max(c0x, x0), min(c1x, x1) + 1):
+            for gy in range(max(c0y, y0), min(c1y, y1) + 1):
+                bucket = self._cells.get((gx, gy))
+                if not bucket:
+                    continue
+                for key, (px, py, rank) in bucket.items():
+                    d = math.hypot(x - px, y - py)
+                    if d <= radius_km:
+                        found.append((d, rank, key))
+        found.sort()
+        return [self._items[key] for _, _, key in found]
+
+
+def _ring(cx: int, cy: int, r: int, x0: int, x1: int, y0: int, y1: int):
+    # cells at Chebyshev distance r from (cx, cy), clipped to the occupied span
+    if r == 0:
+        yield (cx, cy)
+        return
+    lo_x, hi_x = max(cx - r, x0), min(cx + r, x1)
+    for gy in (cy - r, cy + r):
+        if y0 <= gy <= y1:
+            for gx in range(lo_x, hi_x + 1):
+                yield (gx, gy)
+    lo_y, hi_y = max(cy - r + 1, y0), min(cy + r - 1, y1)
+    for gx in (cx - r, cx + r):
+        if x0 <= gx <= x1:
+            for gy in range(lo_y, hi_y + 1):
+                yield (gx, gy)
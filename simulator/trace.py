@@ -0,0 +1,278 @@
+# simulator/trace.py
+from __future__ import annotations
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from model.fleet import BIKE_STATUSES, NO_ID as NONE_ID
+
+
+class _Growable:
+    """Row-appendable typed columns with amortized doubling."""
+
+    def __init__(self, dtypes: Dict[str, object], width: Optional[int], capacity: int):
+        self.width = width
+        self.n = 0
+        shape = (capacity,) if width is None else (capacity, width)
+        self.cols = {k: np.zeros(shape, dtype=dt) for k, dt in dtypes.items()}
+
+    def _reserve(self, extra: int) -> None:
+        cap = next(iter(self.cols.values())).shape[0]
+        if self.n + extra <= cap:
+            return
+        new_cap = max(self.n + extra, 2 * cap, 16)
+        for k, a in self.cols.items():
+            grown = np.zeros((new_cap,) + a.shape[1:], dtype=a.dtype)
+            grown[:self.n] = a[:self.n]
+            self.cols[k] = grown
+
+    def append(self, **values) -> None:
+        if self.width is None:
+            extra = len(next(iter(values.values())))
+        else:
+            extra = 1
+        self._reserve(extra)
+        for k, v in values.items():
+            self.cols[k][self.n:self.n + extra] = v
+        self.n += extra
+
+    def view(self, name: str) -> np.ndarray:
+        return self.cols[name][:self.n]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in self.cols.values())
+
+
+BIKE_COLS = {"x": np.float32, "y": np.float32, "soc": np.float32,
+             "status": np.int8, "order": np.int32, "station": np.int32}
+ORDER_COLS = {"delivered": np.bool_, "assigned": np.int32}
+STATION_COLS = {"queue": np.int16, "charging": np.int16}
+
+
+def static_columns(fleet, orders, stations) -> Dict[str, np.ndarray]:
+    """Columns that never change during a run (stored once per trace)."""
+    return {
+        "bike_ids": fleet.id.astype(np.int32),
+        "order_ids": np.array([o.id for o in orders], dtype=np.int32),
+        "order_x": np.array([o.x for o in orders], dtype=np.float32),
+        "order_y": np.array([o.y for o in orders], dtype=np.float32),
+        "order_deadline": np.array([o.deadline for o in orders], dtype=np.int32),
+        "station_ids": np.array([s.id for s in stations], dtype=np.int32),
+        "station_x": np.array([s.x for s in stations], dtype=np.float32),
+        "station_y": np.array([s.y for s in stations], dtype=np.float32),
+        "station_ports": np.array([s.ports for s in stations], dtype=np.int16),
+    }
+
+
+def gather_state(fleet, orders, stations) -> Dict[str, np.ndarray]:
+    """Current per-entity values for every BIKE/ORDER/STATION column."""
+    return {
+        "x": fleet.x.astype(np.float32),
+        "y": fleet.y.astype(np.float32),
+        "soc": fleet.soc.astype(np.float32),
+        "status": fleet.status.copy(),
+        "order": fleet.target_order_id.astype(np.int32),
+        "station": fleet.target_station_id.astype(np.int32),
+        "delivered": np.array([o.delivered for o in orders], dtype=np.bool_),
+        "assigned": np.array([NONE_ID if o.assigned_to is None else o.assigned_to
+                              for o in orders], dtype=np.int32),
+        "queue": np.array([len(s.queue) for s in stations], dtype=np.int16),
+        "charging": np.array([len(s.charging_bikes) for s in stations], dtype=np.int16),
+    }
+
+
+class TraceView:
+    """
+    Read side shared by in-memory and on-disk traces.
+
+    Subclasses provide len(), frame_times(), state(i) and the static
+    columns (bike_ids, order_ids/x/y/deadline, station_ids/x/y/ports).
+    """
+
+    def frame_times(self) -> np.ndarray:
+        raise NotImplementedError
+
+    def state(self, i: int) -> Dict[str, np.ndarray]:
+        raise NotImplementedError
+
+    def frame_at(self, minute: int) -> int:
+        """Index of the last frame recorded at or before `minute`."""
+        times = self.frame_times()
+        i = int(np.searchsorted(times, minute, side="right")) - 1
+        if i < 0:
+            raise IndexError(f"no trace frame at or before t={minute}")
+        return i
+
+    def __getitem__(self, i: int) -> dict:
+        # legacy snapshot layout (see the old Environment.step)
+        st = self.state(i)
+        n = len(self)
+        t = int(self.frame_times()[i if i >= 0 else i + n])
+
+        def opt(v: int):
+            return None if v == NONE_ID else int(v)
+
+        return {
+            "t": t,
+            "bikes": [
+                (int(bid), float(x), float(y), float(soc), BIKE_STATUSES[s], opt(o), opt(sid))
+                for bid, x, y, soc, s, o, sid in zip(self.bike_ids, st["x"], st["y"], st["soc"],
+                                                    st["status"], st["order"], st["station"])
+            ],
+            "orders": [
+                (int(oid), float(x), float(y), bool(d), opt(a), int(dl))
+                for oid, x, y, d, a, dl in zip(self.order_ids, self.order_x, self.order_y,
+                                               st["delivered"], st["assigned"], self.order_deadline)
+            ],
+            "stations": [
+                (int(sid), float(x), float(y), int(q), int(c), int(p))
+                for sid, x, y, q, c, p in zip(self.station_ids, self.station_x, self.station_y,
+                                              st["queue"], st["charging"], self.station_ports)
+            ],
+        }
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def snapshots(self) -> List[dict]:
+        return list(self)
+
+
+class TraceRecorder(TraceView):
+    """
+    Columnar replacement for the old list-of-dicts env.trace.
+
+    Each recorded frame stores bike position/SOC/status codes/targets,
+    order delivered/assigned flags and station queue sizes in preallocated
+    typed arrays; coordinates that never change (orders, stations) are
+    stored once. Options:
+      enabled=False     record nothing
+      every=N           keep one step in N
+      changed_only=True after the first frame, only store entities whose
+                        recorded values changed (delta rows)
+    Indexing (trace[i], len(trace)) still yields the old snapshot dicts,
+    so existing consumers such as animate_run keep working.
+    """
+
+    def __init__(self, enabled: bool = True, every: int = 1, changed_only: bool = False,
+                 capacity: int = 64):
+        if every < 1:
+            raise ValueError("every must be >= 1")
+        self.enabled = enabled
+        self.every = every
+        self.changed_only = changed_only
+        self.capacity = capacity
+        self._steps = 0
+        self._bound = False
+
+    # ----------------- setup -----------------
+    def bind(self, env) -> None:
+        if not self.enabled:
+            return
+        fleet = env.fleet
+        orders = list(env.orders.values())
+        stations = list(env.stations.values())
+        self._fleet, self._orders, self._stations = fleet, orders, stations
+
+        for k, v in static_columns(fleet, orders, stations).items():
+            setattr(self, k, v)
+
+        cap = self.capacity
+        self.t = _Growable({"t": np.int32}, None, cap)
+        if self.changed_only:
+            # first frame in full, then (frame, index, values...) delta rows
+            self._bike = _Growable(dict(frame=np.int32, idx=np.int32, **BIKE_COLS), None, cap)
+            self._order = _Growable(dict(frame=np.int32, idx=np.int32, **ORDER_COLS), None, cap)
+            self._station = _Growable(dict(frame=np.int32, idx=np.int32, **STATION_COLS), None, cap)
+            self._last: Dict[str, np.ndarray] = {}
+        else:
+            self._bike = _Growable(BIKE_COLS, len(fleet), cap)
+            self._order = _Growable(ORDER_COLS, len(orders), cap)
+            self._station = _Growable(STATION_COLS, len(stations), cap)
+        self._cursor = None
+        self._bound = True
+
+    # ----------------- recording -----------------
+    def record(self, env) -> None:
+        if not self.enabled:
+            return
+        step = self._steps
+        self._steps += 1
+        if step % self.every:
+            return
+        if not self._bound:
+            self.bind(env)
+
+        frame = self.t.n
+        self.t.append(t=[env.t])
+        cur = gather_state(self._fleet, self._orders, self._stations)
+        if not self.changed_only:
+            self._bike.append(**{k: cur[k] for k in BIKE_COLS})
+            self._order.append(**{k: cur[k] for k in ORDER_COLS})
+            self._station.append(**{k: cur[k] for k in STATION_COLS})
+            return
+
+        last = self._last
+        for store, cols in ((self._bike, BIKE_COLS), (self._order, ORDER_COLS),
+                            (self._station, STATION_COLS)):
+            if last:
+                changed = np.zeros(len(cur[next(iter(cols))]), dtype=bool)
+                for k in cols:
+                    changed |= cur[k] != last[k]
+                idx = np.flatnonzero(changed)
+            else:
+                idx = np.arange(len(cur[next(iter(cols))]))
+            if len(idx):
+                store.append(frame=np.full(len(idx), frame, dtype=np.int32), idx=idx,
+                             **{k: cur[k][idx] for k in cols})
+        self._last = cur
+
+    def flush(self) -> None:
+        pass  # nothing buffered; see trace_file.TraceWriter
+
+    # ----------------- reading -----------------
+    def __len__(self) -> int:
+        return self.t.n if self._bound else 0
+
+    @property
+    def nbytes(self) -> int:
+        if not self._bound:
+            return 0
+        return self.t.nbytes + self._bike.nbytes + self._order.nbytes + self._station.nbytes
+
+    def frame_times(self) -> np.ndarray:
+        return self.t.view("t") if self._bound else np.zeros(0, dtype=np.int32)
+
+    def state(self, i: int) -> Dict[str, np.ndarray]:
+        """Column arrays (one entry per bike/order/station) for frame i."""
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("trace frame out of range")
+        if not self.changed_only:
+            out = {k: self._bike.view(k)[i] for k in BIKE_COLS}
+            out.update({k: self._order.view(k)[i] for k in ORDER_COLS})
+            out.update({k: self._station.view(k)[i] for k in STATION_COLS})
+            return out
+
+        # replay deltas from the last reconstructed frame (or from scratch)
+        if self._cursor is None or self._cursor[0] > i:
+            base = {k: np.zeros(len(self._fleet), dtype=dt) for k, dt in BIKE_COLS.items()}
+            base.update({k: np.zeros(len(self._orders), dtype=dt) for k, dt in ORDER_COLS.items()})
+            base.update({k: np.zeros(len(self._stations), dtype=dt) for k, dt in STATION_COLS.items()})
+            start = -1
+        else:
+            start, base = self._cursor
+            base = {k: v.copy() for k, v in base.items()}
+        for store, cols in ((self._bike, BIKE_COLS), (self._order, ORDER_COLS),
+                            (self._station, STATION_COLS)):
+            frames = store.view("frame")
+            lo, hi = np.searchsorted(frames, [start + 1, i + 1], side="left")
+            idx = store.view("idx")[lo:hi]
+            for k in cols:
+                base[k][idx] = store.view(k)[lo:hi]
+        self._cursor = (i, base)
+        return {k: v.copy() for k, v in base.items()}
@@ -0,0 +1,176 @@
+# simulator/trace_file.py
+from __future__ import annotations
+import json
+import os
+import struct
+from typing import Dict, List
+
+import numpy as np
+
+from simulator.trace import (
+    BIKE_COLS, ORDER_COLS, STATION_COLS, TraceView, gather_state, static_columns
+)
+
+MAGIC = b"EVTRACE1"
+ALIGN = 64
+
+# static arrays in file order (name, dtype)
+STATIC_LAYOUT = [
+    ("bike_ids", np.int32), ("order_ids", np.int32), ("order_x", np.float32),
+    ("order_y", np.float32), ("order_deadline", np.int32), ("station_ids", np.int32),
+    ("station_x", np.float32), ("station_y", np.float32), ("station_ports", np.int16),
+]
+
+
+def frame_dtype(n_bikes: int, n_orders: int, n_stations: int) -> np.dtype:
+    """One fixed-size record per frame, so frame i sits at a known offset."""
+    fields = [("t", "<i4")]
+    for cols, n in ((BIKE_COLS, n_bikes), (ORDER_COLS, n_orders), (STATION_COLS, n_stations)):
+        for k, dt in cols.items():
+            fields.append((k, np.dtype(dt).newbyteorder("<"), (n,)))
+    return np.dtype(fields)
+
+
+def _pad(n: int) -> int:
+    return (-n) % ALIGN
+
+
+class TraceWriter:
+    """
+    Streams trace frames to a binary file while the simulation runs.
+
+    Drop-in for TraceRecorder as Environment(trace=...): frames are buffered
+    in a small chunk and appended to disk every `chunk_frames` records, so
+    memory stays constant however long the run. Layout: magic, JSON header,
+    static columns, then fixed-size frame records (see frame_dtype) that
+    TraceReader memory-maps. Only full frames are written (no changed_only).
+    """
+
+    def __init__(self, path: str, every: int = 1, chunk_frames: int = 64):
+        if every < 1:
+            raise ValueError("every must be >= 1")
+        self.path = path
+        self.every = every
+        self.chunk_frames = chunk_frames
+        self.enabled = True
+        self._steps = 0
+        self._n = 0
+        self._f = None
+
+    def bind(self, env) -> None:
+        self._fleet = env.fleet
+        self._orders = list(env.orders.values())
+        self._stations = list(env.stations.values())
+        self._dtype = frame_dtype(len(self._fleet), len(self._orders), len(self._stations))
+        self._buf = np.zeros(self.chunk_frames, dtype=self._dtype)
+        self._n_buf = 0
+
+        static = static_columns(self._fleet, self._orders, self._stations)
+        layout: List[Dict] = []
+        offset = 0
+        for name, dt in STATIC_LAYOUT:
+            arr = static[name].astype(np.dtype(dt).newbyteorder("<"))
+            layout.append({"name": name, "dtype": arr.dtype.str, "offset": offset, "count": len(arr)})
+            offset += arr.nbytes + _pad(arr.nbytes)
+        header = {
+            "version": 1,
+            "n_bikes": len(self._fleet),
+            "n_orders": len(self._orders),
+            "n_stations": len(self._stations),
+            "every": self.every,
+            "static": layout,
+            "static_bytes": offset,
+        }
+        blob = json.dumps(header).encode("utf-8")
+        prefix = len(MAGIC) + 8 + len(blob)
+        static_start = prefix + _pad(prefix)
+
+        d = os.path.dirname(self.path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self._f = open(self.path, "wb")
+        self._f.write(MAGIC + struct.pack("<Q", len(blob)) + blob + b"\0" * _pad(prefix))
+        assert self._f.tell() == static_start
+        for name, dt in STATIC_LAYOUT:
+            arr = static[name].astype(np.dtype(dt).newbyteorder("<"))
+            self._f.write(arr.tobytes() + b"\0" * _pad(arr.nbytes))
+        self._f.flush()
+
+    def record(self, env) -> None:
+        step = self._steps
+        self._steps += 1
+        if step % self.every or self._f is None:
+            return
+        rec = self._buf[self._n_buf]
+        rec["t"] = env.t
+        for k, v in gather_state(self._fleet, self._orders, self._stations).items():
+            rec[k] = v
+        self._n_buf += 1
+        self._n += 1
+        if self._n_buf == self.chunk_frames:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._f is None or self._n_buf == 0:
+            return
+        self._f.write(self._buf[:self._n_buf].tobytes())
+        self._f.flush()
+        self._n_buf = 0
+
+    def close(self) -> None:
+        if self._f is not None:
+            self.flush()
+            self._f.close()
+            self._f = None
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class TraceReader(TraceView):
+    """
+    Memory-mapped view of a TraceWriter file.
+
+    Nothing is loaded up front: trace[i] / state(i) touch only frame i, and
+    frame_at(minute) finds a frame by simulation time. Frames written so
+    far by a still-running simulation are readable too.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not an EV trace file")
+            (n,) = struct.unpack("<Q", f.read(8))
+            self.header = json.loads(f.read(n).decode("utf-8"))
+        prefix = len(MAGIC) + 8 + n
+        static_start = prefix + _pad(prefix)
+
+        h = self.header
+        for item in h["static"]:
+            arr = np.memmap(path, dtype=np.dtype(item["dtype"]), mode="r",
+                            offset=static_start + item["offset"], shape=(item["count"],))
+            setattr(self, item["name"], arr)
+
+        self.dtype = frame_dtype(h["n_bikes"], h["n_orders"], h["n_stations"])
+        self._frames_start = static_start + h["static_bytes"]
+        n_frames = (os.path.getsize(path) - self._frames_start) // self.dtype.itemsize
+        self.frames = np.memmap(path, dtype=self.dtype, mode="r",
+                                offset=self._frames_start, shape=(n_frames,)) if n_frames else \
+            np.zeros(0, dtype=self.dtype)
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def frame_times(self) -> np.ndarray:
+        return self.frames["t"]
+
+    def state(self, i: int) -> Dict[str, np.ndarray]:
+        rec = self.frames[i]
+        return {k: rec[k] for k in list(BIKE_COLS) + list(ORDER_COLS) + list(STATION_COLS)}
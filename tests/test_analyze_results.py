@@ -0,0 +1,25 @@
+# tests/test_analyze_results.py
+import pytest
+
+from experiments.analyze_results import t_quantile
+
+# two-sided Student t critical values (standard tables, 3 decimals)
+T_TABLE = {
+    0.99: {5: 4.032, 6: 3.707, 7: 3.499, 8: 3.355, 9: 3.250, 10: 3.169},
+    0.999: {5: 6.869, 6: 5.959, 7: 5.408, 8: 5.041, 9: 4.781, 10: 4.587},
+}
+
+
+@pytest.mark.parametrize("confidence,df,expected",
+                         [(c, df, t) for c, row in T_TABLE.items() for df, t in row.items()])
+def test_t_quantile_matches_table(confidence, df, expected):
+    assert t_quantile(confidence, df) == pytest.approx(expected, abs=5e-4)
+
+
+@pytest.mark.parametrize("df,expected", [(1, 12.706), (2, 4.303), (3, 3.182), (4, 2.776), (30, 2.042)])
+def test_t_quantile_small_df_95(df, expected):
+    assert t_quantile(0.95, df) == pytest.approx(expected, abs=5e-4)
+
+
+def test_t_quantile_no_df():
+    assert t_quantile(0.95, 0) == float("inf")